@@ -1,6 +1,13 @@
+import os
+import time
+# قبل الاستيراد: أول تشغيل في العملية يشمل زمن استيراد الوحدات (بعده تكون محملة)
+RUN_STARTED = time.perf_counter()
 import streamlit as st
 import pandas as pd
+import numpy as np
 import data_bot  # يعتمد على المحرك الذكي في التصنيف
+import feasibility
+import filters
 
 # ---------------------------------------------------------
 # 1. إعدادات الصفحة والتصميم
@@ -36,24 +43,63 @@ st.markdown("""
 # ---------------------------------------------------------
 # 2. دوال مساعدة
 # ---------------------------------------------------------
-@st.cache_resource(show_spinner="جاري جلب وتحليل البيانات...", ttl=3600)
 def load_data():
-    return data_bot.RealEstateBot()
+    """آخر لقطة من البيانات المشتركة بين كل الجلسات (تتحدث في الخلفية بعد انتهاء صلاحيتها)"""
+    dataset = data_bot.get_shared_dataset()
+    if dataset.is_loaded: return dataset.snapshot()
+    with st.spinner("جاري جلب وتحليل البيانات..."): return dataset.snapshot()
 
-def get_clean_median(df_subset):
-    """حساب الوسيط الحسابي مع استبعاد القيم الشاذة"""
-    if df_subset.empty: return 0, 0
-    # تنظيف سريع
-    vals = pd.to_numeric(df_subset['سعر_المتر'], errors='coerce')
-    vals = vals[(vals > 500) & (vals < 150000)] # استبعاد الأصفار والقيم الخيالية
-    if vals.empty: return 0, 0
-    return vals.median(), len(vals)
+# APP_PROFILE=1: زمن كل تشغيل (الصفحة كاملة أو جزء مستقل) ووسيطه في الشريط الجانبي
+APP_PROFILE = os.environ.get('APP_PROFILE') == '1'
+
+def record_latency(name, started):
+    if not APP_PROFILE: return
+    runs = st.session_state.setdefault('latency_ms', {}).setdefault(name, [])
+    runs.append((time.perf_counter() - started) * 1000)
+    del runs[:-50]
+
+def render_latency():
+    st.caption(f"⏱️ استيراد data_bot: {data_bot.IMPORT_SECONDS * 1000:.0f}ms (مرة لكل عملية)")
+    for name, runs in st.session_state.get('latency_ms', {}).items():
+        st.caption(f"⏱️ {name}: الوسيط {np.median(runs):.0f}ms ({len(runs)} تشغيل)")
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def compute_costs(cost_inputs):
+    """نموذج التكاليف؛ يعاد حسابه فقط عند تغير مدخلات التكلفة"""
+    return feasibility.cost_model(**cost_inputs)
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def market_scan(_bot, version, district):
+    """وسيط وعدد العروض لكل نوع وجداول التفاصيل للحي؛ يعاد حسابه فقط عند تغير الحي أو نسخة البيانات"""
+    scan = {'has_offers': hasattr(_bot, 'market_stat') and _bot.market_stat(district, data_bot.ASK_CATEGORY, data_bot.ALL_TYPES)['rows'] > 0}
+    for key, ptype in [('villa', 'فيلا'), ('apt', 'شقة'), ('floor', 'دور'), ('gen', data_bot.ALL_BUILT)]:
+        scan[key] = get_clean_median(_bot, district, ptype)
+    if scan['has_offers']:
+        for key, ptype in [('villa', 'فيلا'), ('apt', 'شقة'), ('floor', 'دور')]:
+            rows = _bot.query(district=district, category=data_bot.ASK_CATEGORY, property_type=ptype)
+            scan[f"{key}_rows"] = rows[['السعر', 'المساحة', 'سعر_المتر']]
+    return scan
+
+def get_clean_median(bot, district, property_type):
+    """الوسيط (مع استبعاد القيم الشاذة) وعدد العروض من مكعب الإحصائيات المحسوب مسبقاً"""
+    if not hasattr(bot, 'market_stat'): return 0, 0
+    stat = bot.market_stat(district, data_bot.ASK_CATEGORY, property_type)
+    return stat['median'], stat['count']
+
+def render_data_status(bot):
+    """عمر البيانات الحالية وحالة التحديث في الخلفية"""
+    dataset = data_bot.get_shared_dataset()
+    if hasattr(bot, 'age_label'): st.caption(f"🕒 آخر تحديث للبيانات: {bot.age_label()}")
+    if dataset.refreshing: st.caption("🔄 جاري تحديث البيانات في الخلفية...")
+    if dataset.last_error: st.caption(f"⚠️ {dataset.last_error}")
+    pending = getattr(bot, 'pending', {})
+    if pending: st.caption(f"⏳ بيانات جزئية؛ ملفات ما زالت تحمل: {'، '.join(pending.values())}")
 
 # ---------------------------------------------------------
-# 3. تحميل البيانات
+# 3. تحميل البيانات (في الخلفية؛ الانتظار فقط عند أول قسم يحتاجها)
 # ---------------------------------------------------------
-if 'bot' not in st.session_state: st.session_state.bot = load_data()
-df = st.session_state.bot.df if hasattr(st.session_state.bot, 'df') else pd.DataFrame()
+dataset = data_bot.get_shared_dataset()
+dataset.prefetch()
 
 # ---------------------------------------------------------
 # 4. القائمة الجانبية (Sidebar)
@@ -68,31 +114,36 @@ with st.sidebar:
     
     st.divider()
     if st.button("🗑️ تحديث البيانات ومسح الكاش", type="primary", use_container_width=True):
+        # تحديث تزايدي في الخلفية؛ البيانات الحالية تبقى معروضة حتى تجهز الجديدة
+        dataset.refresh_async()
         st.cache_data.clear()
-        st.cache_resource.clear()
-        for key in list(st.session_state.keys()): del st.session_state[key]
         st.rerun()
+    if dataset.is_loaded: render_data_status(dataset.snapshot())
+    else: st.caption("⏳ جاري تحميل البيانات في الخلفية...")
+    if APP_PROFILE: render_latency()
+
+# أول رسم: هيكل الصفحة والقائمة الجانبية ظاهرة قبل أي انتظار للبيانات
+record_latency("أول رسم", RUN_STARTED)
 
 # =========================================================
 # 📊 التطبيق 1: لوحة البيانات (Dashboard)
 # =========================================================
 if app_mode == "📊 لوحة البيانات (Dashboard)":
+    bot = load_data()
+    df = bot.df if hasattr(bot, 'df') else pd.DataFrame()
     if df.empty:
         st.warning("جاري سحب البيانات... يرجى الانتظار")
         st.stop()
 
-    # فلاتر
-    districts = sorted(df['الحي'].astype(str).unique())
-    selected_dist = st.sidebar.selectbox("تصفية حسب الحي:", ["الكل"] + districts)
-    
-    view_df = df if selected_dist == "الكل" else df[df['الحي'] == selected_dist]
+    # فلاتر (عبر فهرس اللقطة بدل مسح الجدول كاملاً)
+    with st.sidebar: selected_dist, active_filters = filters.sidebar_filters(bot.index)
     
     st.title(f"سجل البيانات العقارية: {selected_dist}")
     
     # إحصائيات سريعة
     c1, c2 = st.columns(2)
-    with c1: st.metric("عدد الصفقات (Sold)", len(view_df[view_df['Data_Category'].str.contains('Sold', na=False)]))
-    with c2: st.metric("عدد العروض (Ask)", len(view_df[view_df['Data_Category'].str.contains('Ask', na=False)]))
+    with c1: st.metric("عدد الصفقات (Sold)", bot.count(**active_filters, category=data_bot.SOLD_CATEGORY))
+    with c2: st.metric("عدد العروض (Ask)", bot.count(**active_filters, category=data_bot.ASK_CATEGORY))
     
     st.divider()
 
@@ -102,10 +153,10 @@ if app_mode == "📊 لوحة البيانات (Dashboard)":
     cols = ['Source_File', 'الحي', 'السعر', 'المساحة', 'سعر_المتر', 'نوع_العقار']
     
     with tab1:
-        st.dataframe(view_df[view_df['Data_Category'].str.contains('Sold', na=False)][cols], use_container_width=True)
+        filters.paginated_table(bot, {**active_filters, 'category': data_bot.SOLD_CATEGORY}, key="sold", columns=cols)
         
     with tab2:
-        st.dataframe(view_df[view_df['Data_Category'].str.contains('Ask', na=False)][cols], use_container_width=True)
+        filters.paginated_table(bot, {**active_filters, 'category': data_bot.ASK_CATEGORY}, key="ask", columns=cols)
 
 # =========================================================
 # 🏗️ التطبيق 2: حاسبة التكاليف + ماسح السوق
@@ -117,8 +168,10 @@ elif app_mode == "🏗️ حاسبة التكاليف ودراسة السوق":
     # --- أ) المدخلات (في السايدبار) ---
     with st.sidebar:
         st.header("1️⃣ الموقع")
-        # قائمة الأحياء من البيانات المتوفرة
-        calc_dist = st.selectbox("حي المشروع:", sorted(df['الحي'].astype(str).unique()) if not df.empty else [])
+        # قائمة الأحياء من البيانات المتوفرة (والأحياء المعروفة إلى أن يكتمل التحميل)
+        loaded = dataset.snapshot() if dataset.is_loaded else None
+        district_options = loaded.districts if loaded is not None and not loaded.df.empty else []
+        calc_dist = st.selectbox("حي المشروع:", district_options or sorted(data_bot.KNOWN_DISTRICTS), key="calc_dist")
         
         st.header("2️⃣ الأرض")
         land_area = st.number_input("المساحة (م²)", value=375, step=25)
@@ -140,27 +193,20 @@ elif app_mode == "🏗️ حاسبة التكاليف ودراسة السوق":
         wafi_fees = st.number_input("رسوم وافي", 50000) if is_offplan else 0
 
     # --- ب) محرك الحسابات ---
-    bua = land_area * build_ratio # مسطح البناء
-    
-    # تكاليف الأرض
-    base_land = land_area * land_price
-    land_total = base_land * (1 + (tax_pct + saei_pct)/100)
-    
-    # تكاليف البناء
-    build_total = bua * turnkey_price
-    malath = (bua * bone_price) * 0.01 # 1% من العظم
-    
-    # تكاليف أخرى
-    services_total = units * services
-    sub_total = land_total + build_total + malath + services_total + permits + wafi_fees
-    
-    # طوارئ وتسويق
-    contingency = sub_total * 0.02 # 2% احتياطي
-    marketing = (sub_total + contingency) * (marketing_pct / 100)
-    
-    # الإجمالي
-    grand_total = sub_total + contingency + marketing
-    cost_sqm = grand_total / bua # تكلفة المتر البيعي (على المسطح)
+    cost_inputs = dict(land_area=land_area, land_price=land_price, tax_pct=tax_pct, saei_pct=saei_pct,
+                       build_ratio=build_ratio, turnkey_price=turnkey_price, bone_price=bone_price,
+                       units=units, services=services, permits=permits, marketing_pct=marketing_pct,
+                       wafi_fees=wafi_fees)
+    costs = compute_costs(cost_inputs)
+    bua = costs['bua']                        # مسطح البناء
+    land_total = costs['land_total']          # الأرض مع الضريبة والسعي
+    build_total = costs['build_total']
+    malath = costs['malath']                  # 1% من العظم
+    services_total = costs['services_total']
+    contingency = costs['contingency']        # 2% احتياطي
+    marketing = costs['marketing']
+    grand_total = costs['grand_total']
+    cost_sqm = costs['cost_sqm']              # تكلفة المتر البيعي (على المسطح)
 
     # --- ج) عرض النتائج ---
     # 1. المؤشرات الرئيسية
@@ -199,29 +245,20 @@ elif app_mode == "🏗️ حاسبة التكاليف ودراسة السوق":
     # =========================================================
     st.markdown("---")
     st.header(f"📊 مؤشرات السوق في حي {calc_dist}")
+    bot = load_data()
     
-    # 1. فلترة البيانات (الحي + عروض فقط)
-    # نعتمد على 'Data_Category' لتحديد العروض
-    market_df = df[(df['الحي'] == calc_dist) & (df['Data_Category'].str.contains('Ask', na=False))]
+    # 1. الإحصائيات جاهزة في مكعب البوت (الحي + عروض فقط)، محفوظة لكل (نسخة البيانات، الحي)
+    scan = market_scan(bot, getattr(bot, 'version', 0), calc_dist)
+    has_offers = scan['has_offers']
+    p_villa, n_villa = scan['villa']
+    p_apt, n_apt     = scan['apt']
+    p_floor, n_floor = scan['floor']
+    p_gen, n_gen     = scan['gen']
     
-    if market_df.empty:
+    if not has_offers:
         st.warning(f"لا توجد عروض بيع مسجلة حالياً لحي {calc_dist} للمقارنة.")
     else:
-        # 2. التقسيم حسب "نوع_العقار" الذي صنفه Data Bot
-        villas = market_df[market_df['نوع_العقار'] == 'فيلا']
-        apts   = market_df[market_df['نوع_العقار'] == 'شقة']
-        floors = market_df[market_df['نوع_العقار'] == 'دور']
-        
-        # المتوسط العام (بدون الأراضي)
-        general = market_df[market_df['نوع_العقار'] != 'أرض']
-
-        # 3. حساب المتوسطات
-        p_villa, n_villa = get_clean_median(villas)
-        p_apt, n_apt     = get_clean_median(apts)
-        p_floor, n_floor = get_clean_median(floors)
-        p_gen, n_gen     = get_clean_median(general)
-
-        # 4. عرض الكروت
+        # 2. عرض الكروت (المتوسطات حسب "نوع_العقار" الذي صنفه Data Bot، العام = بدون الأراضي)
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
@@ -233,7 +270,7 @@ elif app_mode == "🏗️ حاسبة التكاليف ودراسة السوق":
             </div>
             """, unsafe_allow_html=True)
             if n_villa > 0:
-                with st.expander("تفاصيل الفلل"): st.dataframe(villas[['السعر', 'المساحة', 'سعر_المتر']], use_container_width=True)
+                with st.expander("تفاصيل الفلل"): st.dataframe(scan['villa_rows'], use_container_width=True)
 
         with col2:
             st.markdown(f"""
@@ -244,7 +281,7 @@ elif app_mode == "🏗️ حاسبة التكاليف ودراسة السوق":
             </div>
             """, unsafe_allow_html=True)
             if n_apt > 0:
-                with st.expander("تفاصيل الشقق"): st.dataframe(apts[['السعر', 'المساحة', 'سعر_المتر']], use_container_width=True)
+                with st.expander("تفاصيل الشقق"): st.dataframe(scan['apt_rows'], use_container_width=True)
 
         with col3:
             st.markdown(f"""
@@ -255,7 +292,7 @@ elif app_mode == "🏗️ حاسبة التكاليف ودراسة السوق":
             </div>
             """, unsafe_allow_html=True)
             if n_floor > 0:
-                with st.expander("تفاصيل الأدوار"): st.dataframe(floors[['السعر', 'المساحة', 'سعر_المتر']], use_container_width=True)
+                with st.expander("تفاصيل الأدوار"): st.dataframe(scan['floor_rows'], use_container_width=True)
 
         with col4:
             st.markdown(f"""
@@ -266,7 +303,7 @@ elif app_mode == "🏗️ حاسبة التكاليف ودراسة السوق":
             </div>
             """, unsafe_allow_html=True)
 
-        # 5. دراسة الجدوى (المقارنة)
+        # 3. دراسة الجدوى (المقارنة)
         st.divider()
         st.subheader("💡 جدوى المشروع (مقارنة بالسوق)")
         
@@ -290,3 +327,143 @@ elif app_mode == "🏗️ حاسبة التكاليف ودراسة السوق":
         with k2:
             show_feasibility("الفلل 🏠", p_villa)
             show_feasibility("المتوسط العام 📈", p_gen)
+
+    # أقرب الصفقات والعروض بالمساحة (فهرس مرتب لكل حي × نوع) بجانب مؤشرات الجدوى
+    @st.fragment
+    def comps_section(bot, calc_dist, land_area, unit_area, cost_sqm):
+        started = time.perf_counter()
+        st.subheader("🔎 عقارات مقارنة")
+        if not hasattr(bot, 'comps'): return
+        type_options = {"الأراضي": 'أرض', "الشقق": 'شقة', "الأدوار": 'دور', "الفلل": 'فيلا'}
+        c1, c2, c3, c4 = st.columns(4)
+        with c1: comp_type = st.selectbox("نوع العقار:", list(type_options), key="comps_type")
+        is_land = type_options[comp_type] == 'أرض'
+        with c2: comp_area = st.number_input("المساحة المستهدفة (م²)", min_value=1, step=10, key=f"comps_area_{comp_type}",
+                                             value=int(land_area if is_land else max(unit_area, 1)))
+        with c3: comp_n = st.select_slider("عدد المقارنات", [5, 10, 20, 50], 10, key="comps_n")
+        with c4:
+            window = st.slider("فرق المساحة المسموح (±%)", 5, 50, data_bot.COMPS_WINDOW_PCT, key="comps_window")
+            widen = st.checkbox("إكمال من الأحياء المجاورة", True, key="comps_widen",
+                                help=", ".join(data_bot.NEIGHBOR_DISTRICTS.get(calc_dist, [])) or "لا توجد أحياء مجاورة معرفة")
+
+        rows, summary = bot.comps(calc_dist, comp_area, type_options[comp_type], n=comp_n, window_pct=window,
+                                  neighbors=None if widen else [])
+        if rows.empty:
+            st.info(f"لا توجد {comp_type} بمساحة قريبة من {comp_area:,} م² في حي {calc_dist}.")
+        else:
+            cols = st.columns(len(summary))
+            for col, (category, stat) in zip(cols, summary.items()):
+                delta = None if is_land or not stat['median'] else f"{(stat['median'] - cost_sqm) / cost_sqm * 100:.1f}% مقابل تكلفتك"
+                # الصفقات لا تميز الشقق والأدوار والفلل: المقارنة فيها مع كل المباني
+                built_any = stat['property_type'] == data_bot.SOLD_BUILT
+                with col:
+                    st.metric(f"وسيط سعر المتر - {category}" + (" (مبني، أي نوع)" if built_any else ""), f"{stat['median']:,.0f}", delta)
+                    st.caption(f"{stat['count']} مقارنة (منها {stat['neighbors']} من الجيران) · "
+                               f"الربيع الأدنى {stat['p25']:,.0f} · الأعلى {stat['p75']:,.0f}")
+            view = rows[['Data_Category', 'الحي', 'نوع_العقار', 'المساحة', 'فرق_المساحة_%', 'السعر', 'سعر_المتر', 'Source_File']]
+            st.dataframe(view.rename(columns={'Data_Category': 'الفئة', 'Source_File': 'المصدر'}), use_container_width=True, hide_index=True,
+                         column_config={"فرق_المساحة_%": st.column_config.NumberColumn(format="%.1f%%")})
+        record_latency("المقارنات", started)
+
+    comps_section(bot, calc_dist, land_area, bua / max(units, 1), cost_sqm)
+
+    # =========================================================
+    # 🔥 هـ) شبكة الحساسية (سعر الأرض × معامل البناء × سعر التنفيذ)
+    # =========================================================
+    market_prices = {}
+    if has_offers:
+        market_prices = {label: price for label, price in [
+            ("الشقق", p_apt), ("الأدوار", p_floor), ("الفلل", p_villa), ("المتوسط العام", p_gen)] if price > 0}
+
+    # أجزاء مستقلة: تغيير أدوات القسم يعيد تشغيله وحده دون التكاليف وماسح السوق
+    @st.fragment
+    def sensitivity_section(cost_inputs, market_prices):
+        started = time.perf_counter()
+        st.markdown("---")
+        st.header("🔥 حساسية الجدوى")
+        if st.toggle("عرض شبكة الحساسية", False):
+            g1, g2, g3 = st.columns(3)
+            with g1: spread = st.slider("نطاق التغيير حول المدخلات (%)", 5, 60, 30)
+            with g2: steps = st.select_slider("عدد النقاط لكل محور", [10, 20, 30, 50], 20)
+            with g3: vary_units = st.checkbox("تغيير عدد الوحدات أيضاً", False)
+
+            grid = feasibility.sensitivity_grid(
+                cost_inputs,
+                land_prices=feasibility.grid_range(cost_inputs['land_price'], spread, steps),
+                build_ratios=np.linspace(1.0, 3.5, steps),
+                turnkey_prices=feasibility.grid_range(cost_inputs['turnkey_price'], spread, steps),
+                units=np.arange(max(1, cost_inputs['units'] - 2), cost_inputs['units'] + 3) if vary_units else None,
+                market_prices=market_prices,
+            )
+            axes = grid['axes']
+
+            # شريحة ثنائية للعرض: سعر الأرض × معامل البناء عند سعر تنفيذ (ووحدات) مختارة
+            s1, s2 = st.columns(2)
+            with s1: t_idx = st.select_slider("سعر المتر (مفتاح)", options=list(range(len(axes['turnkey_price']))),
+                                              value=len(axes['turnkey_price']) // 2, format_func=lambda i: f"{axes['turnkey_price'][i]:,.0f}")
+            with s2: u_idx = st.select_slider("عدد الوحدات", options=list(range(len(axes['units']))),
+                                              value=len(axes['units']) // 2, format_func=lambda i: f"{axes['units'][i]:.0f}")
+            metric = st.radio("المؤشر:", ["تكلفة المتر"] + [f"الهامش مقابل {k}" for k in grid['margins']], horizontal=True)
+
+            values = grid['cost_sqm'] if metric == "تكلفة المتر" else grid['margins'][metric.replace("الهامش مقابل ", "")]
+            heat = pd.DataFrame(values[:, :, t_idx, u_idx],
+                                index=[f"{v:,.0f}" for v in axes['land_price']],
+                                columns=[f"{v:.2f}" for v in axes['build_ratio']])
+            heat.index.name, heat.columns.name = "سعر الأرض", "معامل البناء"
+            cmap = "RdYlGn_r" if metric == "تكلفة المتر" else "RdYlGn"
+            st.dataframe(heat.style.background_gradient(cmap=cmap, axis=None).format("{:,.0f}" if metric == "تكلفة المتر" else "{:.1f}%"),
+                         use_container_width=True)
+            st.caption(f"تم تقييم {grid['cost_sqm'].size:,} سيناريو")
+        record_latency("شبكة الحساسية", started)
+
+    sensitivity_section(cost_inputs, market_prices)
+
+    # =========================================================
+    # 🎲 و) محاكاة المخاطر (مونت كارلو)
+    # =========================================================
+    @st.fragment
+    def risk_section(bot, calc_dist, cost_inputs):
+        started = time.perf_counter()
+        st.markdown("---")
+        st.header("🎲 محاكاة مخاطر الهامش")
+        if st.toggle("تشغيل المحاكاة", False):
+            type_options = {"الشقق": 'شقة', "الأدوار": 'دور', "الفلل": 'فيلا', "المتوسط العام": data_bot.ALL_BUILT}
+            m1, m2, m3 = st.columns(3)
+            with m1:
+                sim_type = st.selectbox("نوع المنتج:", list(type_options))
+                sim_category = st.radio("مصدر الأسعار:", [data_bot.ASK_CATEGORY, data_bot.SOLD_CATEGORY], horizontal=True)
+            with m2:
+                land_sd = st.slider("تذبذب سعر الأرض (±%)", 0, 30, 0)
+                build_sd = st.slider("تذبذب تكلفة البناء (±%)", 0, 30, 10)
+            with m3:
+                target_margin = st.number_input("الهامش المستهدف (%)", value=20.0, step=5.0)
+                draws = st.select_slider("عدد السحبات", [50_000, 100_000, 250_000, 500_000], 100_000)
+
+            # الصفقات لا تميز الشقق والأدوار والفلل: أسعارها تسحب من كل المباني في الحي
+            sim_ptype = data_bot.category_property_type(sim_category, type_options[sim_type])
+            if sim_ptype != type_options[sim_type]: st.caption("ℹ️ الصفقات لا تميز أنواع المباني؛ الأسعار من كل المباني (أي نوع) في الحي.")
+            samples = bot.price_samples(calc_dist, sim_category, sim_ptype) if hasattr(bot, 'price_samples') else []
+            sim = feasibility.simulate_margins(samples, cost_inputs, draws=draws, land_sd_pct=land_sd, build_sd_pct=build_sd, seed=0)
+            if sim is None:
+                st.info(f"لا توجد أسعار {sim_type} في حي {calc_dist} لهذه الفئة.")
+            else:
+                prob = feasibility.prob_margin_above(sim['margins'], target_margin)
+                r1, r2, r3 = st.columns(3)
+                with r1: st.metric(f"احتمال تجاوز {target_margin:.0f}%", f"{prob * 100:.1f}%")
+                with r2: st.metric("الهامش الوسيط", f"{sim['percentiles'][50]:.1f}%")
+                with r3: st.metric("حجم العينة من السوق", f"{sim['samples']:,}")
+
+                p_col, h_col = st.columns([1, 2])
+                with p_col:
+                    st.dataframe(pd.DataFrame({"المئين": [f"P{p}" for p in sim['percentiles']],
+                                               "الهامش": [f"{v:.1f}%" for v in sim['percentiles'].values()]}),
+                                 hide_index=True, use_container_width=True)
+                with h_col:
+                    low, high = sim['percentiles'][5], sim['percentiles'][95]
+                    counts, edges = np.histogram(sim['margins'], bins=40, range=(min(low, target_margin) - 10, max(high, target_margin) + 10))
+                    st.bar_chart(pd.Series(counts, index=[f"{e:.0f}%" for e in edges[:-1]], name="عدد السيناريوهات"))
+        record_latency("محاكاة المخاطر", started)
+
+    risk_section(bot, calc_dist, cost_inputs)
+
+record_latency("الصفحة كاملة", RUN_STARTED)
@@ -0,0 +1,399 @@
+"""قياس أداء سحب البيانات بدون درايف حقيقي
+
+يولد ملفات CSV صناعية تشبه ملفات MOJ والعروض (ترميزات وفواصل مختلفة، أسطر تمهيدية،
+أسماء أحياء ومشاريع عربية) ويقدمها لـ RealEstateBot عبر درايف وهمي داخل العملية.
+
+    python benchmark_ingestion.py                      # 10k و 100k و 1M صف
+    python benchmark_ingestion.py --rows 100000 --latency 0.05
+    python benchmark_ingestion.py --fail-on-regression 20
+    python benchmark_ingestion.py --rows 1000000 --parse-workers 1 4 16
+    python benchmark_ingestion.py --rows 1000000 --snapshot-readers 4   # عدة عمليات على لقطة واحدة
+
+كل حجم يقاس في عملية مستقلة حتى تكون ذروة الذاكرة (RSS) خاصة به، وتضاف النتائج
+إلى ملف JSON lines للمقارنة مع التشغيل السابق لنفس الحجم.
+"""
+import argparse
+import csv
+import datetime
+import functools
+import hashlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import data_bot
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+DEFAULT_OUTPUT = 'benchmark_results.jsonl'
+
+# ==========================================
+# 1. توليد ملفات صناعية
+# ==========================================
+JUNK_PREAMBLE = ['وزارة العدل - المؤشرات العقارية', 'تاريخ التقرير: 1446/05/01', '', 'المدينة: الرياض']
+BAD_DISTRICTS = ['جميع الأحياء', 'مشروع', 'nan', '', 'عام']
+PROJECT_NAMES = ['مشروع {} السكني', 'أبراج {}', 'راكز {}', 'مخطط {}', 'فلل {} الحديثة', 'ضاحية {}']
+DEVELOPERS = ['روشن', 'دار الأركان', 'سدكو', 'مطور خاص', 'راكز']
+PROPERTY_TYPES = ['أرض', 'قطعة أرض', 'فيلا', 'فيلا دوبلكس', 'تاون هاوس', 'شقة', 'شقة تمليك', 'استوديو',
+                  'دور أرضي', 'دور علوي', 'Land', 'Villa', 'Apartment', 'عمارة', 'محل', '']
+
+
+def _price_text(rng, price):
+    # أشكال الأسعار كما تأتي في الملفات الحقيقية
+    style = rng.random()
+    if style < 0.4: return f"{price:,.2f}"
+    if style < 0.7: return f"{price:.0f}"
+    if style < 0.9: return f"{price:,.0f} ريال"
+    return ''
+
+
+def generate_csv(rng, rows, kind, encoding='utf-8-sig', sep=','):
+    """ملف بأعمدة وأسلوب صفقات MOJ (kind='moj') أو عروض المطورين (kind='offers')"""
+    out = io.StringIO()
+    for line in rng.sample(JUNK_PREAMBLE, rng.randint(0, len(JUNK_PREAMBLE))):
+        if line: out.write(line + '\n')
+    writer = csv.writer(out, delimiter=sep, lineterminator='\n')
+    if kind == 'moj':
+        writer.writerow(['رقم الصفقة', 'المدينة', 'الحي', 'نوع العقار', 'السعر', 'المساحة'])
+    else:
+        writer.writerow(['اسم المشروع', 'المطور', 'الحي', 'نوع العقار', 'Price', 'Area'])
+
+    districts = data_bot.KNOWN_DISTRICTS
+    for n in range(rows):
+        district = rng.choice(districts)
+        area = rng.choice([rng.uniform(100, 1200), rng.uniform(150, 450), rng.uniform(5, 20)])
+        price = area * rng.lognormvariate(8.2, 0.5)
+        raw_district = rng.choice(BAD_DISTRICTS) if rng.random() < 0.15 else district
+        ptype = rng.choice(PROPERTY_TYPES)
+        if kind == 'moj':
+            writer.writerow([100000 + n, 'الرياض', raw_district, ptype, _price_text(rng, price), f"{area:.2f}"])
+        else:
+            project = rng.choice(PROJECT_NAMES).format(rng.choice(districts))
+            writer.writerow([project, rng.choice(DEVELOPERS), raw_district, ptype, _price_text(rng, price), f"{area:.0f}"])
+    return out.getvalue().encode(encoding)
+
+
+def generate_folder(total_rows, files=12, seed=0):
+    """مجلد صناعي: قائمة (اسم، بايتات) بأحجام غير متساوية ومزيج من الترميزات والفواصل"""
+    rng = random.Random(seed)
+    weights = [rng.uniform(0.2, 2.0) for _ in range(files)]
+    scale = total_rows / sum(weights)
+    folder = []
+    for i, w in enumerate(weights):
+        kind = 'moj' if i % 2 == 0 else 'offers'
+        district = rng.choice(data_bot.KNOWN_DISTRICTS)
+        name = f"MOJ صفقات {district} {i}.csv" if kind == 'moj' else f"عروض {district} {i}.csv"
+        encoding = rng.choice(['utf-8-sig', 'utf-8-sig', 'utf-16'])
+        sep = rng.choice([',', ',', ';', '\t'])
+        folder.append((name, generate_csv(rng, max(1, int(w * scale)), kind, encoding, sep)))
+    return folder
+
+
+# ==========================================
+# 2. درايف وهمي بنفس واجهة files().list / get_media
+# ==========================================
+class _Request:
+    def __init__(self, fn): self.fn = fn
+    def execute(self, http=None): return self.fn()
+
+
+class FakeDriveService:
+    """بديل داخل العملية لخدمة درايف؛ latency تحاكي زمن التحميل لكل ملف"""
+
+    def __init__(self, folder, latency=0.0):
+        self.latency = latency
+        self.files_by_id = {}
+        for i, (name, content) in enumerate(folder):
+            self.files_by_id[f"fake-{i}"] = {'id': f"fake-{i}", 'name': name, 'content': content,
+                                             'md5Checksum': hashlib.md5(content).hexdigest(),
+                                             'size': str(len(content))}
+
+    def files(self): return self
+
+    def list(self, q=None, fields=None):
+        listing = [{k: v for k, v in f.items() if k != 'content'} for f in self.files_by_id.values()]
+        return _Request(lambda: {'files': listing})
+
+    def get_media(self, fileId):
+        def fetch():
+            if self.latency: time.sleep(self.latency)
+            return self.files_by_id[fileId]['content']
+        return _Request(fetch)
+
+
+# ==========================================
+# 3. قياس المراحل
+# ==========================================
+STAGES = {
+    'download': (data_bot.RealEstateBot, 'download_file'),
+    'download_stream': (data_bot.RealEstateBot, 'download_to_file'),
+    'read_csv': (data_bot, 'read_raw_csv'),
+    'resolve_district': (data_bot, 'resolve_districts'),
+    'classify': (data_bot, 'classify_property_types'),
+    'parse_total': (data_bot, 'parse_csv_file'),
+    'stat_sketches': (data_bot, 'build_stat_sketches'),
+}
+
+
+def instrument_stages(totals):
+    """تغليف دوال المراحل لتجميع زمنها (مجموع عبر الخيوط)"""
+    for stage, (owner, attr) in STAGES.items():
+        original = getattr(owner, attr)
+
+        def timed(*args, _original=original, _stage=stage, **kwargs):
+            started = time.perf_counter()
+            try: return _original(*args, **kwargs)
+            finally: totals[_stage] = totals.get(_stage, 0.0) + time.perf_counter() - started
+
+        setattr(owner, attr, functools.wraps(original)(timed))
+
+
+def import_seconds():
+    """زمن `import data_bot` في مفسر جديد (بدون وحدات محملة مسبقاً)، كما في أول تشغيل للتطبيق"""
+    code = "import time; t = time.perf_counter(); import data_bot; print(time.perf_counter() - t)"
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(proc.stdout.strip().splitlines()[-1]) if proc.returncode == 0 else None
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_once(rows, files, workers, latency, seed, parse_workers=0):
+    """تشغيل واحد داخل هذه العملية ويعيد سجل النتائج"""
+    started = time.perf_counter()
+    folder = generate_folder(rows, files, seed)
+    generate_s = time.perf_counter() - started
+    total_bytes = sum(len(content) for _, content in folder)
+
+    totals = {}
+    instrument_stages(totals)
+    service = FakeDriveService(folder, latency)
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    bot = data_bot.RealEstateBot(max_workers=workers, cache_dir='', service=service, parse_workers=parse_workers,
+                                 load_deadline=0)
+    wall = time.perf_counter() - started
+
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'rows': rows, 'files': files, 'workers': workers, 'parse_workers': parse_workers, 'latency': latency,
+        'input_mb': round(total_bytes / 1e6, 2),
+        'rows_out': len(bot.df),
+        'generate_s': round(generate_s, 3),
+        'wall_s': round(wall, 3),
+        'stages_s': {k: round(v, 3) for k, v in totals.items()},
+        'bot_timings_s': {k: round(v, 3) for k, v in bot.timings.items()},
+        'rows_per_s': round(rows / wall) if wall else None,
+        'mb_per_s': round(total_bytes / 1e6 / wall, 2) if wall else None,
+        'sketch_median_error_pct': round(sketch_error_pct(bot), 3),
+        'import_data_bot_s': import_seconds(),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'parse_workers_peak_rss_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        'rss_before_load_mb': round(rss_before, 1),
+        'python': platform.python_version(),
+        'pandas': data_bot.pd.__version__,
+        'commit': _git_commit(),
+    }
+
+
+def sketch_error_pct(bot):
+    """أكبر خطأ نسبي (%) لوسيط المكعب (من السكتشات) مقابل الوسيط الدقيق من كل الصفوف"""
+    exact = data_bot.build_market_stats(bot.df)
+    errors = [abs(bot.market_stats[key]['median'] - stat['median']) / stat['median'] * 100
+              for key, stat in exact.items() if stat['count'] and key in bot.market_stats]
+    return max(errors, default=0.0)
+
+
+def _git_commit():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception: return ''
+
+
+# ==========================================
+# 4. حفظ النتائج والمقارنة مع التشغيل السابق
+# ==========================================
+def previous_result(output, record):
+    try:
+        with open(output, encoding='utf-8') as fh: history = [json.loads(line) for line in fh if line.strip()]
+    except FileNotFoundError: return None
+    same = [r for r in history if r.get('mode') == record.get('mode')
+            and all(r.get(k, 0) == record[k] for k in ('rows', 'files', 'workers', 'parse_workers', 'latency'))]
+    return same[-1] if same else None
+
+
+def report(record, previous):
+    print(f"📊 {record['rows']:,} صف | {record['files']} ملف | {record['input_mb']} MB | عمال {record['workers']}"
+          f" | عمليات التحليل {record['parse_workers']}")
+    print(f"   الزمن الكلي: {record['wall_s']}s  ({record['rows_per_s']:,} صف/ث، {record['mb_per_s']} MB/ث)")
+    print(f"   ذروة الذاكرة: {record['peak_rss_mb']} MB")
+    if record.get('import_data_bot_s') is not None: print(f"   استيراد data_bot: {record['import_data_bot_s']:.3f}s")
+    if 'sketch_median_error_pct' in record: print(f"   أكبر خطأ لوسيط السكتش: {record['sketch_median_error_pct']}%")
+    for stage, seconds in record['stages_s'].items(): print(f"   - {stage}: {seconds}s")
+    if previous:
+        change = (record['wall_s'] - previous['wall_s']) / previous['wall_s'] * 100 if previous['wall_s'] else 0.0
+        print(f"   مقارنة بالتشغيل السابق ({previous.get('commit') or previous['timestamp']}): {change:+.1f}%")
+        return change
+    return None
+
+
+# ==========================================
+# 5. عدة عمليات تطبيق على لقطة واحدة (الربط بالذاكرة والانتقال لنسخة جديدة)
+# ==========================================
+def process_memory_mb():
+    """RSS و PSS (حصة العملية من الصفحات المشتركة) وجزء PSS من الملفات المربوطة، من /proc/self/smaps_rollup"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as fh:
+        for line in fh:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss', 'Pss_File'): values[key] = int(rest.split()[0]) / 1024
+    return {'rss_mb': round(values.get('Rss', 0.0), 1), 'pss_mb': round(values.get('Pss', 0.0), 1),
+            'pss_file_mb': round(values.get('Pss_File', 0.0), 1)}
+
+
+def snapshot_reader(snapshot_dir):
+    """وضع داخلي: عملية قارئة بنفس مسار التطبيق (SharedDataset على مجلد اللقطات)؛ تكتب سطر JSON بعد الربط
+    ثم بعد كل سطر 'switch' على stdin (تحديث إلى أحدث نسخة)"""
+    dataset = data_bot.SharedDataset(ttl=float('inf'), bot_factory=functools.partial(
+        data_bot.RealEstateBot, snapshot_dir=snapshot_dir, autoload=False))
+    base = process_memory_mb()
+
+    def attached():
+        snap = dataset.snapshot()
+        # قراءة كل الأعمدة (كما تفعل الفلاتر والرسوم) حتى تحسب صفحاتها في الذاكرة
+        snap.df.count()
+        return {'pid': os.getpid(), 'version': dataset.bot.snapshot_version, 'rows': len(snap.df),
+                'base_pss_mb': base['pss_mb'], **process_memory_mb()}
+
+    print(json.dumps(attached()), flush=True)
+    for line in sys.stdin:
+        if line.strip() != 'switch': break
+        dataset.refresh_async()
+        while dataset.refreshing: time.sleep(0.01)
+        print(json.dumps(attached()), flush=True)
+    return 0
+
+
+def _reader_line(proc):
+    line = proc.stdout.readline()
+    if not line: raise RuntimeError(f"توقفت عملية القراءة {proc.pid} (رمز {proc.poll()})")
+    return json.loads(line)
+
+
+def run_snapshot_readers(rows, files, readers, seed):
+    """لقطة واحدة وعدة عمليات قارئة: زيادة PSS لكل عملية بعد الربط، ثم نشر نسخة جديدة وانتقال الجميع إليها"""
+    bot = data_bot.RealEstateBot(cache_dir='', service=FakeDriveService(generate_folder(rows, files, seed)), load_deadline=0)
+    with tempfile.TemporaryDirectory(prefix='snapshot-bench-') as snapshot_dir:
+        first = bot.write_snapshot(snapshot_dir)
+        snapshot_mb = os.path.getsize(data_bot._snapshot_paths(snapshot_dir, first)[0]) / 1e6
+        cmd = [sys.executable, os.path.abspath(__file__), '--snapshot-reader', snapshot_dir]
+        procs = [subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True) for _ in range(readers)]
+        try:
+            attach = [_reader_line(proc) for proc in procs]
+            # رقم النسخة بدقة الثانية: ننتظر حتى لا تحمل النسخة الجديدة نفس الرقم
+            time.sleep(1.1)
+            second = bot.write_snapshot(snapshot_dir)
+            started = time.perf_counter()
+            for proc in procs:
+                proc.stdin.write('switch\n')
+                proc.stdin.flush()
+            switch = [_reader_line(proc) for proc in procs]
+            switch_s = time.perf_counter() - started
+        finally:
+            for proc in procs:
+                try: proc.stdin.close()
+                except OSError: pass
+                proc.wait()
+
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'mode': 'snapshot_readers',
+        'rows': rows, 'files': files, 'workers': 0, 'parse_workers': 0, 'latency': 0.0, 'readers': readers,
+        'rows_out': len(bot.df),
+        'frame_mb': round(bot.df.memory_usage(deep=True).sum() / 1e6, 1),
+        'snapshot_mb': round(snapshot_mb, 1),
+        'attached_versions_ok': all(r['version'] == first and r['rows'] == len(bot.df) for r in attach),
+        'attach_pss_growth_mb': [round(r['pss_mb'] - r['base_pss_mb'], 1) for r in attach],
+        'attach_pss_file_mb': [r['pss_file_mb'] for r in attach],
+        'switched': all(r['version'] == second for r in switch),
+        'switch_s': round(switch_s, 3),
+        'switch_pss_growth_mb': [round(r['pss_mb'] - r['base_pss_mb'], 1) for r in switch],
+        'python': platform.python_version(),
+        'pandas': data_bot.pd.__version__,
+        'commit': _git_commit(),
+    }
+
+
+def report_snapshot_readers(record):
+    print(f"🧩 {record['rows']:,} صف | لقطة {record['snapshot_mb']} MB (الجدول في الذاكرة {record['frame_mb']} MB)"
+          f" | {record['readers']} عمليات قراءة")
+    print(f"   زيادة PSS لكل عملية بعد الربط: {record['attach_pss_growth_mb']} MB"
+          f" (منها من الملف المربوط {record['attach_pss_file_mb']} MB)")
+    print(f"   الانتقال للنسخة الجديدة: {'✅' if record['switched'] else '❌'} خلال {record['switch_s']}s،"
+          f" PSS بعده {record['switch_pss_growth_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس أداء سحب وتنظيف البيانات على ملفات صناعية")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS)
+    parser.add_argument('--files', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=data_bot.DOWNLOAD_WORKERS)
+    parser.add_argument('--parse-workers', type=int, nargs='+', default=[data_bot.PARSE_WORKERS],
+                        help="عدد عمليات التحليل (0 = داخل خيوط التحميل)؛ عدة قيم تقاس كل منها")
+    parser.add_argument('--latency', type=float, default=0.0, help="تأخير محاكى لكل تحميل (ثانية)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--fail-on-regression', type=float, default=None, metavar='PCT',
+                        help="الخروج برمز خطأ إذا كان أي حجم أبطأ من التشغيل السابق بهذه النسبة")
+    parser.add_argument('--snapshot-readers', type=int, default=0, metavar='N',
+                        help="بدل قياس السحب: كتابة لقطة وربطها في N عمليات وقياس PSS ثم نشر نسخة جديدة")
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--snapshot-reader', default='', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.snapshot_reader: return snapshot_reader(args.snapshot_reader)
+    if args.snapshot_readers:
+        failed = False
+        for rows in args.rows:
+            try: record = run_snapshot_readers(rows, args.files, args.snapshot_readers, args.seed)
+            except RuntimeError as e:
+                print(f"❌ فشل قياس اللقطة المشتركة لحجم {rows:,}: {e}")
+                failed = True
+                continue
+            report_snapshot_readers(record)
+            failed = failed or not (record['attached_versions_ok'] and record['switched'])
+            with open(args.output, 'a', encoding='utf-8') as fh: fh.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return 1 if failed else 0
+
+    if args.single:
+        # وضع داخلي: حجم واحد في عملية مستقلة، والنتيجة JSON على stdout
+        record = run_once(args.rows[0], args.files, args.workers, args.latency, args.seed, args.parse_workers[0])
+        print(json.dumps(record, ensure_ascii=False))
+        return 0
+
+    regressed = False
+    for rows, parse_workers in [(r, p) for r in args.rows for p in args.parse_workers]:
+        cmd = [sys.executable, os.path.abspath(__file__), '--single', '--rows', str(rows), '--files', str(args.files),
+               '--workers', str(args.workers), '--parse-workers', str(parse_workers), '--latency', str(args.latency),
+               '--seed', str(args.seed)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"❌ فشل القياس لحجم {rows:,} ({parse_workers} عمليات تحليل):\n{proc.stderr}")
+            regressed = True
+            continue
+        record = json.loads(proc.stdout.strip().splitlines()[-1])
+        change = report(record, previous_result(args.output, record))
+        if args.fail_on_regression is not None and change is not None and change > args.fail_on_regression: regressed = True
+        with open(args.output, 'a', encoding='utf-8') as fh: fh.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""بناء لقطة البيانات خارج التطبيق (مثلاً من cron)
+
+يسحب ملفات درايف وينظفها ويبني مكعب الإحصائيات ثم يكتب لقطة Arrow جاهزة في مجلد،
+فتفتحها التطبيقات عند الإقلاع بربط الملف بالذاكرة بدل السحب من درايف:
+
+    python build_snapshot.py --out snapshots
+    DATA_SNAPSHOT_DIR=snapshots streamlit run app.py
+
+يخرج برمز خطأ إذا فشل السحب أو كان الجدول فارغاً، ولا يمس اللقطة الحالية في هذه الحالة.
+
+مع --watch يبقى كعملية نشر دائمة لعدة خوادم Streamlit: يحدث تزايدياً كل فترة وينشر لقطة جديدة،
+وكل عملية تطبيق تربط نفس الملف بالذاكرة (قراءة فقط) وتنتقل للنسخة الجديدة عند تغير المؤشر:
+
+    python build_snapshot.py --out /dev/shm/realestate --watch 900
+"""
+import argparse
+import sys
+import time
+
+from google.oauth2 import service_account
+
+import data_bot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="بناء لقطة Arrow لبيانات العقار من درايف")
+    parser.add_argument('--credentials', default='credentials.json', help="ملف حساب الخدمة")
+    parser.add_argument('--out', default=data_bot.SNAPSHOT_DIR or 'snapshots', help="مجلد اللقطات")
+    parser.add_argument('--workers', type=int, default=data_bot.DOWNLOAD_WORKERS)
+    parser.add_argument('--keep', type=int, default=data_bot.SNAPSHOT_KEEP, help="عدد اللقطات المحفوظة")
+    parser.add_argument('--no-cache', action='store_true', help="تجاهل كاش الملفات المنظفة")
+    parser.add_argument('--watch', type=int, default=0, metavar='SECONDS',
+                        help="البقاء قيد التشغيل ونشر لقطة جديدة كل هذه المدة (0 = مرة واحدة)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    creds = service_account.Credentials.from_service_account_file(args.credentials, scopes=data_bot.SCOPES)
+    bot = data_bot.RealEstateBot(max_workers=args.workers, cache_dir='' if args.no_cache else data_bot.CACHE_DIR,
+                                 creds=creds, snapshot_dir='', load_deadline=0)
+    published = False
+    while True:
+        changed = bot.refresh_stats.get('downloaded') or bot.refresh_stats.get('evicted')
+        if bot.load_error or bot.df.empty:
+            print(f"❌ فشل بناء اللقطة: {bot.load_error or 'لا توجد بيانات'}", file=sys.stderr)
+            if not args.watch: return 1
+        elif published and not changed:
+            print("… لا تغيير في المجلد؛ اللقطة الحالية كما هي", flush=True)
+        else:
+            published = True
+            version = bot.write_snapshot(args.out, keep=args.keep)
+            print(f"✅ لقطة {version}: {len(bot.df):,} صف في {time.perf_counter() - started:.1f}s → {args.out}", flush=True)
+            if not args.watch: return 0
+        time.sleep(args.watch)
+        started = time.perf_counter()
+        bot.refresh()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,8 @@
+import time
 import streamlit as st
 import pandas as pd
 import data_bot  # المحرك
+import filters
 
 # إعداد الصفحة
 st.set_page_config(page_title="منصة البيانات العقارية", layout="wide", page_icon="📊")
@@ -14,13 +16,39 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- الاتصال بالمحرك ---
-if 'bot' not in st.session_state:
-    with st.spinner("جاري الاتصال بقاعدة البيانات..."):
-        try: st.session_state.bot = data_bot.RealEstateBot()
-        except: st.error("خطأ في الاتصال")
+# --- الاتصال بالمحرك (بيانات مشتركة بين كل الجلسات) ---
+dataset = data_bot.get_shared_dataset()
 
-df = st.session_state.bot.df if hasattr(st.session_state.bot, 'df') else pd.DataFrame()
+
+def render_progress(reports, partial_df):
+    """ما وصل من الملفات أثناء التحميل الأول (الأعداد، الملفات، الأحياء) قبل اكتمال اللقطة"""
+    st.info(f"⏳ جاري سحب البيانات... {len(reports)} ملف جاهز حتى الآن")
+    if partial_df.empty: return
+    categories = partial_df['Data_Category'].astype(str)
+    c1, c2, c3 = st.columns(3)
+    with c1: st.metric("صفقات منفذة", f"{(categories == data_bot.SOLD_CATEGORY).sum():,}")
+    with c2: st.metric("عروض متاحة", f"{(categories == data_bot.ASK_CATEGORY).sum():,}")
+    with c3: st.metric("الأحياء", partial_df['الحي'].nunique())
+    st.dataframe(pd.DataFrame(reports)[['name', 'status', 'rows_out']], hide_index=True, use_container_width=True,
+                 column_config={"name": st.column_config.TextColumn("الملف"), "status": st.column_config.TextColumn("الحالة"),
+                                "rows_out": st.column_config.NumberColumn("المعتمد")})
+    st.caption("الأحياء حتى الآن: " + "، ".join(sorted(partial_df['الحي'].astype(str).unique())))
+
+
+if not dataset.is_loaded:
+    # التحميل الأول في الخلفية، وكل ملف يظهر فور جاهزيته بدل انتظار آخر ملف
+    dataset.prefetch()
+    progress_area = st.empty()
+    while not dataset.is_loaded and dataset.refreshing:
+        with progress_area.container(): render_progress(*dataset.progress_view())
+        time.sleep(0.5)
+    progress_area.empty()
+if dataset.is_loaded: bot = dataset.snapshot()
+else:
+    with st.spinner("جاري الاتصال بقاعدة البيانات..."): bot = dataset.snapshot()
+if dataset.last_error and not dataset.is_loaded: st.error("خطأ في الاتصال")
+
+df = bot.df if hasattr(bot, 'df') else pd.DataFrame()
 
 # ========================================================
 # 🟢 القائمة الجانبية (فلتر البحث + ملخص المصادر)
@@ -30,8 +58,44 @@ with st.sidebar:
     
     if st.button("🔄 تحديث البيانات", type="primary", use_container_width=True):
         st.cache_data.clear()
-        for key in list(st.session_state.keys()): del st.session_state[key]
+        # تحديث تزايدي في الخلفية؛ الجدول الحالي يبقى معروضاً حتى تجهز النسخة الجديدة
+        dataset.refresh_async()
         st.rerun()
+
+    st.caption(f"🕒 آخر تحديث للبيانات: {bot.age_label()}")
+    if dataset.refreshing: st.caption("🔄 جاري تحديث البيانات في الخلفية...")
+    if dataset.last_error: st.caption(f"⚠️ {dataset.last_error}")
+    pending = getattr(bot, 'pending', {})
+    if pending: st.caption(f"⏳ بيانات جزئية؛ ملفات ما زالت تحمل: {'، '.join(pending.values())}")
+    # تشخيص السحب: زمن كل ملف والصفوف المستبعدة والأخطاء (يظهر حتى لو فشل كل شيء)
+    report = getattr(bot, 'ingestion_report', [])
+    if report:
+        report_df = pd.DataFrame(report)
+        failed = report_df[report_df['status'] == 'failed']
+        label = f"🩺 تشخيص السحب ({len(failed)} ملف فشل)" if len(failed) else "🩺 تشخيص السحب"
+        with st.expander(label):
+            timings = getattr(bot, 'timings', {})
+            if timings: st.caption(" | ".join(f"{k}: {v:.2f}s" for k, v in timings.items()))
+            st.dataframe(
+                report_df[['name', 'status', 'bytes', 'download_s', 'parse_s', 'rows_read', 'dropped_nan',
+                           'dropped_small_area', 'dropped_unresolved_district', 'dropped_rakez', 'rows_out']],
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "name": st.column_config.TextColumn("الملف"),
+                    "status": st.column_config.TextColumn("الحالة"),
+                    "bytes": st.column_config.NumberColumn("الحجم", format="%d B"),
+                    "download_s": st.column_config.NumberColumn("تحميل", format="%.2fs"),
+                    "parse_s": st.column_config.NumberColumn("تحليل", format="%.2fs"),
+                    "rows_read": st.column_config.NumberColumn("مقروء"),
+                    "dropped_nan": st.column_config.NumberColumn("بلا سعر/مساحة"),
+                    "dropped_small_area": st.column_config.NumberColumn("مساحة ≤ 10"),
+                    "dropped_unresolved_district": st.column_config.NumberColumn("حي غير معروف"),
+                    "dropped_rakez": st.column_config.NumberColumn("راكز"),
+                    "rows_out": st.column_config.NumberColumn("المعتمد"),
+                }
+            )
+            for _, row in failed.iterrows(): st.error(f"{row['name']}: {row['error']}")
     
     st.divider()
 
@@ -39,23 +103,16 @@ with st.sidebar:
         st.warning("جاري سحب البيانات...")
         st.stop()
 
-    # فلتر الحي
-    districts = sorted(df['الحي'].unique()) if 'الحي' in df.columns else []
-    selected_dist = st.selectbox("تصفية حسب الحي:", ["الكل"] + districts)
-    
-    # تطبيق الفلتر
-    if selected_dist != "الكل":
-        filtered_df = df[df['الحي'] == selected_dist]
-    else:
-        filtered_df = df
+    # فلتر الحي + الفلاتر الإضافية (عبر فهرس اللقطة بدل مسح الجدول كاملاً)
+    selected_dist, active_filters = filters.sidebar_filters(bot.index)
 
     # 📊 ملخص البيانات (تم التحديث هنا حسب طلبك)
     st.divider()
     st.markdown("### 📊 ملخص البيانات")
     
     # 1. إحصائيات عامة
-    count_sold = len(filtered_df[filtered_df['Data_Category'] == 'صفقات (Sold)'])
-    count_ask = len(filtered_df[filtered_df['Data_Category'] == 'عروض (Ask)'])
+    count_sold = bot.count(**active_filters, category=data_bot.SOLD_CATEGORY)
+    count_ask = bot.count(**active_filters, category=data_bot.ASK_CATEGORY)
     st.write(f"🟢 صفقات منفذة: **{count_sold}**")
     st.write(f"🔵 عروض متاحة: **{count_ask}**")
     
@@ -114,41 +171,29 @@ tab_deals, tab_offers = st.tabs(["💰 الصفقات (Sold)", "🏷️ العر
 # --- الصفقات ---
 with tab_deals:
     st.subheader("سجل الصفقات المتممة")
-    deals_data = filtered_df[filtered_df['Data_Category'] == 'صفقات (Sold)'].copy()
-    
-    if not deals_data.empty:
-        final_cols = [c for c in display_columns if c in deals_data.columns]
-        display_df = deals_data[final_cols].rename(columns=column_rename_map)
-        
-        st.dataframe(
-            display_df.sort_values('سعر المتر'),
-            use_container_width=True,
-            column_config={
-                "السعر": st.column_config.NumberColumn(format="%d ريال"),
-                "سعر المتر": st.column_config.NumberColumn(format="%d ريال"),
-                "المساحة": st.column_config.NumberColumn(format="%d م²"),
-            }
-        )
-    else:
+    shown = filters.paginated_table(
+        bot, {**active_filters, 'category': data_bot.SOLD_CATEGORY}, key="deals_data",
+        columns=display_columns, rename=column_rename_map,
+        column_config={
+            "السعر": st.column_config.NumberColumn(format="%d ريال"),
+            "سعر المتر": st.column_config.NumberColumn(format="%d ريال"),
+            "المساحة": st.column_config.NumberColumn(format="%d م²"),
+        }
+    )
+    if not shown:
         st.info("لا توجد صفقات مسجلة.")
 
 # --- العروض ---
 with tab_offers:
     st.subheader("قائمة العروض الحالية")
-    offers_data = filtered_df[filtered_df['Data_Category'] == 'عروض (Ask)'].copy()
-    
-    if not offers_data.empty:
-        final_cols = [c for c in display_columns if c in offers_data.columns]
-        display_df = offers_data[final_cols].rename(columns=column_rename_map)
-        
-        st.dataframe(
-            display_df.sort_values('سعر المتر'),
-            use_container_width=True,
-            column_config={
-                "السعر": st.column_config.NumberColumn(format="%d ريال"),
-                "سعر المتر": st.column_config.NumberColumn(format="%d ريال"),
-                "المساحة": st.column_config.NumberColumn(format="%d م²"),
-            }
-        )
-    else:
+    shown = filters.paginated_table(
+        bot, {**active_filters, 'category': data_bot.ASK_CATEGORY}, key="offers_data",
+        columns=display_columns, rename=column_rename_map,
+        column_config={
+            "السعر": st.column_config.NumberColumn(format="%d ريال"),
+            "سعر المتر": st.column_config.NumberColumn(format="%d ريال"),
+            "المساحة": st.column_config.NumberColumn(format="%d م²"),
+        }
+    )
+    if not shown:
         st.warning("لا توجد عروض متاحة.")
@@ -1,10 +1,17 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
 import streamlit as st
 import pandas as pd
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import numpy as np
+import functools
 import io
+import json
 import os
 import re
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
 
 # ==========================================
 # 1. إعدادات الاتصال
@@ -12,6 +19,48 @@ import re
 FOLDER_ID = "1kgzKj9sn8pQVjr78XcN7_iF5KLmflwME"
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
 
+# عدد التحميلات المتزامنة من درايف (1 = التحميل التسلسلي القديم)
+DOWNLOAD_WORKERS = int(os.environ.get('DRIVE_DOWNLOAD_WORKERS', 8))
+
+# مجلد الكاش المحلي للملفات المنظفة (فارغ = بدون كاش على القرص)
+CACHE_DIR = os.environ.get('DRIVE_CACHE_DIR', '.drive_cache')
+# يرفع عند تغيير منطق التنظيف حتى لا نقرأ جداول قديمة من الكاش
+PARSER_VERSION = 2
+
+# تخزين مضغوط للجدول النهائي (فئات بدل النصوص المكررة + float32) - اختياري
+COMPACT_DTYPES = os.environ.get('DATA_COMPACT_DTYPES', '0') == '1'
+
+# عمر اللقطة المشتركة (بالثواني) قبل تحديثها في الخلفية
+DATA_TTL_SECONDS = int(os.environ.get('DATA_TTL_SECONDS', 3600))
+
+# ملف JSON lines لتقرير السحب لكل ملف (فارغ = بدون حفظ على القرص)
+INGESTION_LOG = os.environ.get('INGESTION_LOG', '')
+
+# مجلد لقطات Arrow الجاهزة (يكتبها build_snapshot.py)؛ إذا حدد تقرأ التطبيقات منه بدل درايف
+SNAPSHOT_DIR = os.environ.get('DATA_SNAPSHOT_DIR', '')
+SNAPSHOT_KEEP = 3
+# كل كم ثانية تفحص عمليات التطبيق مؤشر أحدث لقطة (فحص ملف صغير فقط)
+SNAPSHOT_POLL_SECONDS = int(os.environ.get('DATA_SNAPSHOT_POLL_SECONDS', 30))
+
+# الملفات الأكبر من هذا الحجم تقرأ وتنظف على دفعات من الصفوف (ذروة الذاكرة بحجم الدفعة لا الملف)
+STREAM_MIN_BYTES = int(os.environ.get('DATA_STREAM_MIN_MB', 64)) * 1024 * 1024
+STREAM_CHUNK_ROWS = int(os.environ.get('DATA_STREAM_CHUNK_ROWS', 200_000))
+# وهذه الملفات نفسها تحمل على دفعات إلى ملف مؤقت على القرص بدل جمعها كبايتات في الذاكرة
+DOWNLOAD_CHUNK_BYTES = int(os.environ.get('DRIVE_DOWNLOAD_CHUNK_MB', 8)) * 1024 * 1024
+
+# مهلة كل ملف منذ بدء تحميله (شاملة الإعادات، وهي أيضاً مهلة الاتصال والقراءة)، والمهلة الكلية للتحميل
+# (بعدها يعرض ما اكتمل وتكمل الملفات المتأخرة في الخلفية؛ 0 = بدون مهلة)
+FILE_TIMEOUT_SECONDS = int(os.environ.get('DRIVE_FILE_TIMEOUT', 120))
+LOAD_DEADLINE_SECONDS = float(os.environ.get('DATA_LOAD_DEADLINE', 45))
+# إعادة المحاولة للأخطاء المؤقتة (انقطاع، 429، 5xx) مع انتظار يتضاعف
+DOWNLOAD_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1.0
+TRANSIENT_HTTP_STATUS = {408, 429, 500, 502, 503, 504}
+
+# عدد عمليات تحليل وتنظيف الملفات (0 = التحليل داخل خيوط التحميل)
+# العمليات تستلم المحتوى كبايتات، فالتحميل إلى ملف مؤقت (الملفات الكبيرة) في مسار الخيوط وحده
+PARSE_WORKERS = int(os.environ.get('DATA_PARSE_WORKERS', 0))
+
 # قائمة الأحياء للمساعدة في الاستخراج
 KNOWN_DISTRICTS = [
     'الملقا', 'العارض', 'النرجس', 'الياسمين', 'القيروان', 'حطين', 'العقيق', 'النخيل', 
@@ -39,148 +88,1644 @@ COLUMN_MAPPING = {
     'المطور': 'اسم_المطور'
 }
 
+# ==========================================
+# 2. استخراج الحي (على مستوى العمود)
+# ==========================================
+# كلمات تدل على أن خانة الحي لا تحمل اسم حي حقيقي
+BAD_DISTRICT_WORDS = ['جميع', 'All', 'مشروع', 'Project', 'عام', 'راكز', 'Rakez', 'nan', 'None', 'مخطط', 'عروض', 'صفقات']
+RAKEZ_WORDS = ['راكز', 'Rakez']
+GENERIC_DISTRICT_VALUES = {'عروض', 'Offers', 'صفقات', 'Sold'}
+FILENAME_NOISE = re.compile(r'(صفقات|عروض|sold|ask|offers|deals|الرياض|riyadh|\.csv)', flags=re.IGNORECASE)
+
+# أسماء بديلة (كتابة مختلفة أو إنجليزية) -> الاسم المعتمد في KNOWN_DISTRICTS
+DISTRICT_ALIASES = {
+    'الملك عبد الله': 'الملك عبدالله', 'الدار البيضا': 'الدار البيضاء', 'اشبيلية': 'اشبيليا',
+    'malqa': 'الملقا', 'hittin': 'حطين', 'hitteen': 'حطين', 'narjis': 'النرجس', 'yasmin': 'الياسمين',
+    'yasmeen': 'الياسمين', 'aqiq': 'العقيق', 'olaya': 'العليا', 'sahafa': 'الصحافة', 'qirawan': 'القيروان',
+}
+
+# توحيد الكتابة: التشكيل والتطويل يحذفان، والهمزات/التاء المربوطة/الألف المقصورة تطوى إلى حرف واحد
+ARABIC_MARKS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+ARABIC_FOLDING = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ة': 'ه', 'ى': 'ي'})
+NORMALIZE_CACHE_SIZE = 65536
+
+
+@functools.lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def clean_arabic_text(text):
+    """حذف التشكيل والتطويل والمسافات الزائدة (للعرض: الحروف كما هي)"""
+    return ' '.join(ARABIC_MARKS.sub('', text).split())
+
+
+@functools.lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_arabic(text):
+    """الصيغة الموحدة للمقارنة فقط (لا تعرض)"""
+    return clean_arabic_text(text).translate(ARABIC_FOLDING).lower()
+
+
+# الصيغة الموحدة -> الاسم المعتمد، وأولوية كل اسم حسب ترتيبه في القائمة
+CANONICAL_DISTRICTS = {}
+DISTRICT_PRIORITY = {}
+for _i, _name in enumerate(KNOWN_DISTRICTS):
+    CANONICAL_DISTRICTS.setdefault(normalize_arabic(_name), _name)
+    DISTRICT_PRIORITY.setdefault(_name, _i)
+for _alias, _name in DISTRICT_ALIASES.items(): CANONICAL_DISTRICTS.setdefault(normalize_arabic(_alias), _name)
+
+# نمط واحد لكل الصيغ الموحدة؛ الـ lookahead يلتقط التطابقات المتداخلة
+# وعند كل موضع يختار أول حي في القائمة، ثم نأخذ الأقل ترتيباً بين كل المواضع
+# الأسماء القصيرة (3 أحرف) يجب ألا تلاصق حرفاً عربياً حتى لا تطابق داخل كلمات أخرى (احد / واحد)؛
+# الشرطة السفلية والأرقام وغيرها فواصل كما في أسماء الملفات (صفقات_احد_2024)
+ARABIC_LETTER = '[\u0621-\u064a]'
+DISTRICT_MATCHER = re.compile('(?=(' + '|'.join(
+    re.escape(key) if len(key) > 3 else rf'(?<!{ARABIC_LETTER}){re.escape(key)}(?!{ARABIC_LETTER})'
+    for key in sorted(CANONICAL_DISTRICTS, key=lambda k: DISTRICT_PRIORITY[CANONICAL_DISTRICTS[k]])) + '))')
+
+
+def find_known_district(text):
+    """أول حي من KNOWN_DISTRICTS (بترتيب القائمة) يظهر داخل النص بعد توحيد الكتابة"""
+    hits = DISTRICT_MATCHER.findall(normalize_arabic(text))
+    if not hits: return None
+    return min((CANONICAL_DISTRICTS[h] for h in hits), key=DISTRICT_PRIORITY.__getitem__)
+
+
+def canonical_district(value):
+    """الاسم المعتمد إذا كانت القيمة صيغة أخرى لحي معروف (مع أو بدون كلمة "حي")، وإلا القيمة بعد تنظيف الكتابة"""
+    key = normalize_arabic(value)
+    if key.startswith('حي '): key = key[3:]
+    return CANONICAL_DISTRICTS.get(key) or clean_arabic_text(value)
+
+
+def is_bad_district(value):
+    return any(w in value for w in BAD_DISTRICT_WORDS) or len(value) < 3
+
+
+def resolve_districts(districts, projects, file_name, data_cat, drops=None):
+    """تحديد الحي لكل صف؛ البدائل الثابتة للملف تحسب مرة واحدة وكل قيمة فريدة تفحص مرة واحدة
+
+    drops (اختياري) يستقبل عدد الصفوف المستبعدة: فلتر راكز، وحي غير معروف"""
+    # البديل من اسم الملف ثابت لكل الصفوف
+    clean_filename = FILENAME_NOISE.sub('', file_name).strip()
+    clean_filename = clean_filename.replace('_', ' ').replace('-', ' ').strip()
+    fallback = find_known_district(file_name)
+    if fallback is None and len(clean_filename) > 2: fallback = clean_filename
+
+    current = districts.map(str).str.strip().to_numpy(dtype=object)
+    codes, uniques = pd.factorize(current)
+    bad = np.array([is_bad_district(u) for u in uniques], dtype=bool)[codes] if len(uniques) else np.zeros(len(current), dtype=bool)
+
+    candidate = current.copy()
+    if bad.any():
+        project = projects.map(str).str.strip().to_numpy(dtype=object)[bad]
+        p_codes, p_uniques = pd.factorize(project)
+        found = np.array([find_known_district(u) for u in p_uniques] + [None], dtype=object)[p_codes]
+        if fallback is not None: found[pd.isna(found)] = fallback
+        found[pd.isna(found)] = current[bad][pd.isna(found)]
+        candidate[bad] = found
+
+    # الفلاتر النهائية: راكز في العروض فقط، والكلمات العامة المتبقية
+    def finalize(value):
+        if 'Ask' in data_cat and any(w in value for w in RAKEZ_WORDS): return None
+        if value in GENERIC_DISTRICT_VALUES: return None
+        return value
+
+    f_codes, f_uniques = pd.factorize(candidate)
+    finals = [finalize(canonical_district(u)) for u in f_uniques]
+    resolved = np.array(finals + [None], dtype=object)[f_codes]
+    if drops is not None:
+        is_rakez = np.array([f is None and any(w in u for w in RAKEZ_WORDS) for f, u in zip(finals, f_uniques)] + [False], dtype=bool)
+        rakez = int(is_rakez[f_codes].sum())
+        drops['dropped_rakez'] = drops.get('dropped_rakez', 0) + rakez
+        drops['dropped_unresolved_district'] = drops.get('dropped_unresolved_district', 0) + int(pd.isna(resolved).sum()) - rakez
+    return pd.Series(resolved, index=districts.index)
+
+
+# ==========================================
+# 3. تصنيف العقار (على مستوى العمود)
+# ==========================================
+# الترتيب مهم: أول فئة تطابق هي المعتمدة
+PROPERTY_KEYWORDS = [
+    ("أرض", ['أرض', 'land', 'راس', 'قطعة']),
+    ("فيلا", ['فيلا', 'فله', 'فلل', 'villa', 'تاون', 'town', 'بنتهاوس', 'penthouse', 'دبلكس']),
+    ("شقة", ['شقة', 'شقه', 'شقق', 'apartment', 'flat', 'تمليك', 'استوديو']),
+    ("دور", ['دور', 'طابق', 'floor', 'ادوار', 'أدوار']),
+]
+# الصفقات لا تميز أنواع المباني: كل ما ليس أرضاً يصنف "مبني"
+SOLD_BUILT = "مبني"
+# كلمة لا تحتسب إذا تلاها هذا الحرف: أرضي/أرضية تعني الدور الأرضي وليست أرضاً
+KEYWORD_NOT_FOLLOWED_BY = {'أرض': 'ي'}
+PROPERTY_PATTERNS = [(label, re.compile('|'.join(
+    re.escape(normalize_arabic(w)) + (f'(?!{KEYWORD_NOT_FOLLOWED_BY[w]})' if w in KEYWORD_NOT_FOLLOWED_BY else '')
+    for w in words))) for label, words in PROPERTY_KEYWORDS]
+
+
+def match_property_keyword(raw, sold):
+    """فئة العقار من الكلمات المفتاحية (بعد توحيد الكتابة)؛ الصفقات تميز الأرض فقط"""
+    raw = normalize_arabic(raw)
+    for label, pattern in (PROPERTY_PATTERNS[:1] if sold else PROPERTY_PATTERNS):
+        if pattern.search(raw): return label
+    return None
+
+
+def classify_property_types(raw_types, areas, data_cat):
+    """تصنيف كل الصفوف: الكلمات المفتاحية تفحص مرة لكل قيمة فريدة، والباقي حسب المساحة"""
+    sold = 'صفقات' in data_cat or 'Sold' in data_cat
+    codes, uniques = pd.factorize(raw_types.map(str).to_numpy(dtype=object))
+    labels = np.array([match_property_keyword(u, sold) for u in uniques] + [None], dtype=object)[codes]
+
+    unmatched = pd.isna(labels)
+    if unmatched.any():
+        if sold:
+            # الصفقات: أرض أو مبني
+            labels[unmatched] = SOLD_BUILT
+        else:
+            # العروض: التصنيف بالمساحة (<200 شقة، 200-360 دور، غير ذلك فيلا)
+            area = areas.to_numpy(dtype=float)[unmatched]
+            labels[unmatched] = np.select([area < 200, (area >= 200) & (area < 360)], ["شقة", "دور"], "فيلا")
+    return pd.Series(labels, index=raw_types.index)
+
+
+# ==========================================
+# 4. قراءة وتنظيف ملف واحد
+# ==========================================
+HEADER_KEYWORDS = ['السعر', 'Price', 'قيمة', 'المساحة', 'Area']
+HEADER_SCAN_LINES = 50
+SNIFF_BYTES = 64 * 1024
+# فواصل أسطر يعترف بها splitlines ولا يعترف بها محلل C؛ وجودها يعني المسار القديم
+EXOTIC_LINE_BREAKS = re.compile('[\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+
+def find_header(lines):
+    """رقم سطر العناوين والفاصل (نفحص أول 50 سطر بحثاً عن كلمات مفتاحية)؛ None إن لم نجده"""
+    for i, line in enumerate(lines[:HEADER_SCAN_LINES]):
+        if any(k in line for k in HEADER_KEYWORDS):
+            return i, ';' if ';' in line else '\t' if '\t' in line else ','
+    return None
+
+
+def sniff_csv_layout(content_bytes):
+    """الترميز وسطر العناوين والفاصل من أول جزء من الملف فقط؛ None إذا لم يكف الجزء للحكم"""
+    if content_bytes[:2] in (b'\xff\xfe', b'\xfe\xff'): encoding = 'utf-16'
+    else: encoding = 'utf-8-sig'  # بدون BOM: إن لم يكن الملف utf-8 صالحاً يفشل المحلل ونرجع للمسار القديم
+
+    prefix = content_bytes[:SNIFF_BYTES]
+    complete = len(prefix) == len(content_bytes)
+    if encoding == 'utf-16': prefix = prefix[:len(prefix) // 2 * 2]
+    text = prefix.decode(encoding, errors='strict' if complete else 'ignore')
+    if EXOTIC_LINE_BREAKS.search(text): return None
+
+    lines = text.splitlines()
+    # السطر الأخير قد يكون مقطوعاً إذا لم نقرأ الملف كاملاً
+    if not complete: lines = lines[:-1]
+    header = find_header(lines)
+    if header is None:
+        if not complete and len(lines) < HEADER_SCAN_LINES: return None
+        header = (0, ',')
+    return (encoding,) + header
+
+
+def content_size(content):
+    """حجم المحتوى: بايتات أو ملف ثنائي (التحميل المتدفق)"""
+    if isinstance(content, (bytes, bytearray, memoryview)): return len(content)
+    position = content.tell()
+    size = content.seek(0, io.SEEK_END)
+    content.seek(position)
+    return size
+
+
+def csv_source(content):
+    """مصدر يقرأ منه read_csv من أوله"""
+    if isinstance(content, (bytes, bytearray, memoryview)): return io.BytesIO(content)
+    content.seek(0)
+    return content
+
+
+def content_head(content):
+    """أول SNIFF_BYTES + 1 بايت: تكفي sniff_csv_layout لتعرف هل قرأت الملف كاملاً"""
+    if isinstance(content, (bytes, bytearray, memoryview)): return content[:SNIFF_BYTES + 1]
+    head = csv_source(content).read(SNIFF_BYTES + 1)
+    content.seek(0)
+    return head
+
+
+def read_raw_csv(content_bytes):
+    """قراءة الجدول الخام: المسار السريع (محلل C على البايتات مباشرة) ثم المسار القديم عند الفشل"""
+    layout = sniff_csv_layout(content_bytes)
+    if layout is not None:
+        encoding, header_idx, sep = layout
+        try:
+            return pd.read_csv(io.BytesIO(content_bytes), encoding=encoding, sep=sep, header=header_idx,
+                               engine='c', float_precision='round_trip')
+        except Exception: pass
+
+    # المسار القديم: فك الترميز كاملاً ثم محلل python
+    try: content_str = content_bytes.decode('utf-8-sig')
+    except: content_str = content_bytes.decode('utf-16')
+    header_idx, sep = find_header(content_str.splitlines()) or (0, ',')
+    return pd.read_csv(io.StringIO(content_str), sep=sep, header=header_idx, engine='python')
+
+
+def clean_raw_frame(df_temp, file_name, report):
+    """تنظيف جدول خام (ملف كامل أو دفعة منه): الأرقام، الفلاتر، الحي، ونوع العقار
+
+    العدادات والأزمنة تضاف إلى report حتى تتجمع عبر الدفعات"""
+    started = time.perf_counter()
+    fname = file_name.lower()
+
+    # توحيد الأعمدة
+    df_temp.columns = df_temp.columns.str.strip()
+    df_temp.rename(columns=COLUMN_MAPPING, inplace=True)
+
+    # تحديد الفئة
+    data_cat = "عروض (Ask)" if "عروض" in fname or "offer" in fname else "صفقات (Sold)"
+
+    # تنظيف الأرقام
+    for col in ['السعر', 'المساحة']:
+        if col in df_temp.columns:
+            df_temp[col] = pd.to_numeric(df_temp[col].astype(str).str.replace(r'[^\d.]', '', regex=True), errors='coerce')
+
+    rows = len(df_temp)
+    df_temp.dropna(subset=['السعر', 'المساحة'], inplace=True)
+    report['dropped_nan'] = report.get('dropped_nan', 0) + rows - len(df_temp)
+    rows = len(df_temp)
+    df_temp = df_temp[df_temp['المساحة'] > 10]
+    report['dropped_small_area'] = report.get('dropped_small_area', 0) + rows - len(df_temp)
+    df_temp['سعر_المتر'] = df_temp['السعر'] / df_temp['المساحة']
+    df_temp['Source_File'] = file_name
+    df_temp['Data_Category'] = data_cat
+
+    if 'الحي' not in df_temp.columns: df_temp['الحي'] = None
+    if 'اسم_المشروع_الخام' not in df_temp.columns: df_temp['اسم_المشروع_الخام'] = ''
+    report['clean_s'] = report.get('clean_s', 0.0) + time.perf_counter() - started
+
+    # =================================================
+    # 1. استخراج الحي
+    # =================================================
+    step = time.perf_counter()
+    df_temp['الحي'] = resolve_districts(df_temp['الحي'], df_temp['اسم_المشروع_الخام'], file_name, data_cat, drops=report)
+    df_temp.dropna(subset=['الحي'], inplace=True)
+    report['district_s'] = report.get('district_s', 0.0) + time.perf_counter() - step
+
+    # =================================================
+    # 2. تصنيف العقار
+    # =================================================
+    step = time.perf_counter()
+    raw_types = df_temp['نوع_العقار_الخام'] if 'نوع_العقار_الخام' in df_temp.columns else pd.Series('', index=df_temp.index)
+    df_temp['نوع_العقار'] = classify_property_types(raw_types, df_temp['المساحة'], data_cat)
+    report['classify_s'] = report.get('classify_s', 0.0) + time.perf_counter() - step
+
+    cols = ['Source_File', 'Data_Category', 'الحي', 'السعر', 'المساحة', 'سعر_المتر', 'نوع_العقار', 'نوع_العقار_الخام']
+    existing_cols = [c for c in cols if c in df_temp.columns]
+    report['rows_out'] = report.get('rows_out', 0) + len(df_temp)
+    return df_temp[existing_cols]
+
+
+def parse_csv_chunks(file_name, content, chunk_rows, report):
+    """المسار المتدفق: كل دفعة صفوف تنظف وتحول نصوصها إلى فئات ثم تضاف، بدل بناء الجدول الخام كاملاً
+
+    content بايتات أو ملف ثنائي (ملف التحميل المؤقت، فلا يقرأ كاملاً في الذاكرة)
+    يعيد None إذا تعذر (تخطيط غير معروف أو خطأ في القراءة) فيرجع المستدعي للمسار العادي"""
+    layout = sniff_csv_layout(content_head(content))
+    if layout is None: return None
+    encoding, header_idx, sep = layout
+    partial = {}
+    parts = []
+    try:
+        with pd.read_csv(csv_source(content), encoding=encoding, sep=sep, header=header_idx, engine='c',
+                         float_precision='round_trip', chunksize=chunk_rows) as reader:
+            while True:
+                step = time.perf_counter()
+                try: chunk = next(reader)
+                except StopIteration: break
+                partial['read_s'] = partial.get('read_s', 0.0) + time.perf_counter() - step
+                partial['rows_read'] = partial.get('rows_read', 0) + len(chunk)
+                parts.append(categorize_frame(clean_raw_frame(chunk, file_name, partial)))
+    except Exception: return None
+    if not parts: return None
+    for key, value in partial.items(): report[key] = report.get(key, 0) + value
+    report['chunks'] = len(parts)
+    return concat_categorical(parts)
+
+
+def parse_csv_file(file_name, content_bytes, report=None, chunk_rows=None):
+    """تحويل محتوى ملف CSV الخام (بايتات أو ملف ثنائي) إلى جدول منظف وموحد الأعمدة
+
+    report (اختياري) يستقبل أزمنة المراحل وعدد الصفوف المقروءة والمستبعدة عند كل فلتر
+    chunk_rows: حجم الدفعة للقراءة المتدفقة (None = تلقائياً للملفات الكبيرة، 0 = بدون تدفق)؛
+    القيم الناتجة مطابقة للمسار العادي لكن الأعمدة النصية تعود category"""
+    report = {} if report is None else report
+    started = time.perf_counter()
+    if chunk_rows is None: chunk_rows = STREAM_CHUNK_ROWS if content_size(content_bytes) >= STREAM_MIN_BYTES else 0
+    if chunk_rows:
+        streamed = parse_csv_chunks(file_name, content_bytes, chunk_rows, report)
+        if streamed is not None:
+            report['parse_s'] = time.perf_counter() - started
+            return streamed
+
+    # قراءة الملف من سطر العناوين الصحيح (الملف المؤقت يقرأ كاملاً هنا فقط عند فشل المسار المتدفق)
+    if not isinstance(content_bytes, (bytes, bytearray, memoryview)): content_bytes = csv_source(content_bytes).read()
+    df_temp = read_raw_csv(content_bytes)
+    report['read_s'] = time.perf_counter() - started
+    report['rows_read'] = len(df_temp)
+
+    df_temp = clean_raw_frame(df_temp, file_name, report)
+    report['parse_s'] = time.perf_counter() - started
+    return df_temp
+
+
+def parse_file_columnar(file_name, content_bytes):
+    """تحليل ملف داخل عملية مستقلة؛ الجدول يعود كـ Arrow IPC (أعمدة متصلة وقواميس للنصوص) بدل pickle لأعمدة object"""
+    import pyarrow as pa
+
+    report = {}
+    table = pa.Table.from_pandas(categorize_frame(parse_csv_file(file_name, content_bytes, report=report)), preserve_index=True)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer: writer.write_table(table)
+    return sink.getvalue(), report
+
+
+def frame_from_columnar(payload):
+    import pyarrow as pa
+
+    return pa.ipc.open_stream(payload).read_all().to_pandas()
+
+
+# ==========================================
+# 5. التخزين المضغوط للجدول النهائي
+# ==========================================
+# أعمدة نصية بقيم قليلة التكرار تتحول إلى category
+CATEGORY_COLUMNS = ['Source_File', 'Data_Category', 'الحي', 'نوع_العقار', 'نوع_العقار_الخام']
+# السعر والمساحة تنزل إلى int32/float32 فقط إذا لم تتغير أي قيمة؛ سعر المتر قيمة مشتقة فيكفي تقريب بسيط
+EXACT_FLOAT_COLUMNS = ['السعر', 'المساحة']
+DERIVED_FLOAT_COLUMNS = ['سعر_المتر']
+
+
+def _downcast_float(values, exact):
+    down = values.astype('float32')
+    if exact: ok = np.array_equal(down.to_numpy(dtype='float64'), values.to_numpy(dtype='float64'), equal_nan=True)
+    else: ok = np.allclose(down.to_numpy(dtype='float64'), values.to_numpy(dtype='float64'), rtol=1e-6, atol=0, equal_nan=True)
+    return down if ok else values
+
+
+def compact_frame(df):
+    """نسخة أخف من الجدول بنفس القيم؛ الفلاتر (==، str.contains، unique) تعمل كما هي"""
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns: df[col] = df[col].astype('category')
+    for col in EXACT_FLOAT_COLUMNS + DERIVED_FLOAT_COLUMNS:
+        if col not in df.columns: continue
+        if pd.api.types.is_integer_dtype(df[col]): df[col] = pd.to_numeric(df[col], downcast='integer')
+        elif pd.api.types.is_float_dtype(df[col]): df[col] = _downcast_float(df[col], exact=col in EXACT_FLOAT_COLUMNS)
+    return df
+
+
+def categorize_frame(df):
+    """تحويل الأعمدة النصية المكررة فقط إلى category (الأرقام كما هي)"""
+    return df.astype({col: 'category' for col in CATEGORY_COLUMNS if col in df.columns})
+
+
+def concat_categorical(frames, ignore_index=False):
+    """دمج أجزاء جدول مع توحيد قواميس الأعمدة الفئوية أولاً (وإلا يحولها pd.concat إلى object)"""
+    frames = list(frames)
+    for col in CATEGORY_COLUMNS:
+        parts = [f[col] for f in frames if col in f.columns]
+        if len(parts) != len(frames) or not all(isinstance(p.dtype, pd.CategoricalDtype) for p in parts): continue
+        categories = parts[0].cat.categories.append([p.cat.categories for p in parts[1:]]).unique()
+        frames = [f.assign(**{col: f[col].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=ignore_index)
+
+
+def column_memory(df):
+    """حجم كل عمود بالبايت (شامل النصوص)"""
+    return df.memory_usage(deep=True, index=False)
+
+
+# ==========================================
+# 6. كاش الملفات المنظفة على القرص
+# ==========================================
+class FrameCache:
+    """حفظ جدول كل ملف بعد التنظيف (Parquet) مع بصمة نسخته في درايف"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest = self._read_manifest()
+        # التحديث وخيط الملفات المتأخرة قد يكتبان في نفس الوقت
+        self._lock = threading.Lock()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as fh: manifest = json.load(fh)
+        except Exception: return {}
+        # كاش من نسخة تنظيف قديمة لا يعتمد عليه
+        if manifest.get('parser_version') != PARSER_VERSION: return {}
+        return manifest.get('files', {})
+
+    def _write_manifest(self):
+        # يستدعى تحت self._lock؛ اسم مؤقت خاص بكل كتابة حتى لا تتداخل عمليتان على نفس الملف
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as fh:
+            json.dump({'parser_version': PARSER_VERSION, 'files': self.manifest}, fh, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _path(self, file_id):
+        return os.path.join(self.cache_dir, f"{file_id}.parquet")
+
+    def get(self, file_id, fingerprint):
+        entry = self.manifest.get(file_id)
+        if not entry or entry.get('fingerprint') != fingerprint: return None
+        try: return pd.read_parquet(self._path(file_id))
+        except Exception: return None
+
+    def put(self, file_id, name, fingerprint, df):
+        try: df.to_parquet(self._path(file_id), index=False)
+        except Exception: return
+        with self._lock:
+            self.manifest[file_id] = {'name': name, 'fingerprint': fingerprint}
+            try: self._write_manifest()
+            except OSError: pass
+
+    def evict(self, keep_ids):
+        with self._lock:
+            removed = [fid for fid in self.manifest if fid not in keep_ids]
+            for fid in removed: self.manifest.pop(fid, None)
+            if removed: self._write_manifest()
+        for fid in removed:
+            try: os.remove(self._path(fid))
+            except OSError: pass
+        return removed
+
+
+def file_fingerprint(meta):
+    """بصمة نسخة الملف في درايف: md5 إن وجد وإلا وقت آخر تعديل، مع الاسم
+    (الفئة والمصدر والحي الاحتياطي تؤخذ من اسم الملف، وإعادة التسمية لا تغير md5)"""
+    version = meta.get('md5Checksum') or meta.get('modifiedTime')
+    return f"{version}:{meta['name']}" if version else ''
+
+
+# ==========================================
+# 7. مكعب إحصائيات السوق (حي × فئة × نوع)
+# ==========================================
+# نافذة استبعاد القيم الشاذة لسعر المتر
+PRICE_SQM_MIN = 500
+PRICE_SQM_MAX = 150000
+ASK_CATEGORY = "عروض (Ask)"
+SOLD_CATEGORY = "صفقات (Sold)"
+# مفاتيح التجميع: كل الأنواع عدا الأرض، وكل الأنواع
+ALL_BUILT = "الكل (بدون أرض)"
+ALL_TYPES = "الكل"
+STAT_QUANTILES = {'p10': 0.10, 'p25': 0.25, 'p75': 0.75, 'p90': 0.90}
+EMPTY_STAT = {'median': 0, 'count': 0, 'rows': 0, **{k: 0 for k in STAT_QUANTILES}}
+STAT_KEYS = ['الحي', 'Data_Category', 'نوع_العقار']
+
+
+def category_property_type(category, property_type):
+    """النوع المقابل داخل الفئة: شقة/دور/فيلا في الصفقات تقابل "مبني" (أي نوع)، والباقي كما هو"""
+    if category == SOLD_CATEGORY and property_type not in (None, 'أرض', SOLD_BUILT, ALL_BUILT, ALL_TYPES): return SOLD_BUILT
+    return property_type
+
+
+def clean_price_values(values):
+    """سعر المتر بعد استبعاد الأصفار والقيم الخيالية"""
+    values = pd.to_numeric(values, errors='coerce')
+    return values[(values > PRICE_SQM_MIN) & (values < PRICE_SQM_MAX)]
+
+
+def _stat_rows(df):
+    """مفاتيح المكعب مع سعر المتر، مضافاً إليها صفوف التجميع (غير الأرض تحت ALL_BUILT، والكل تحت ALL_TYPES)"""
+    if df.empty or not set(STAT_KEYS + ['سعر_المتر']).issubset(df.columns): return None
+    keys = pd.DataFrame({k: df[k].astype(str).to_numpy() for k in STAT_KEYS})
+    keys['v'] = pd.to_numeric(df['سعر_المتر'], errors='coerce').to_numpy(dtype=float)
+
+    built = keys[keys['نوع_العقار'] != 'أرض'].assign(نوع_العقار=ALL_BUILT)
+    everything = keys.assign(نوع_العقار=ALL_TYPES)
+    return pd.concat([keys, built, everything], ignore_index=True)
+
+
+def build_market_stats(df):
+    """حساب المكعب بدقة من كل الصفوف: (الحي، الفئة، النوع) -> الوسيط والعدد والمئينات (مرجع لدقة السكتشات)"""
+    keys = _stat_rows(df)
+    if keys is None: return {}
+
+    rows = keys.groupby(STAT_KEYS, sort=False).size()
+    clean = keys[(keys['v'] > PRICE_SQM_MIN) & (keys['v'] < PRICE_SQM_MAX)]
+    grouped = clean.groupby(STAT_KEYS, sort=False)['v']
+    table = grouped.agg(['median', 'count'])
+    for name, q in STAT_QUANTILES.items(): table[name] = grouped.quantile(q)
+
+    cube = {key: {**EMPTY_STAT, 'rows': int(n)} for key, n in rows.items()}
+    for key, row in table.iterrows():
+        cube[key].update({k: float(v) for k, v in row.items()})
+        cube[key]['count'] = int(row['count'])
+    return cube
+
+
+def build_price_samples(df):
+    """جداول العينات للمحاكاة: (الحي، الفئة، النوع) -> أسعار المتر النظيفة مرتبة (float32)"""
+    keys = _stat_rows(df)
+    if keys is None: return {}
+    clean = keys[(keys['v'] > PRICE_SQM_MIN) & (keys['v'] < PRICE_SQM_MAX)]
+    return {key: np.sort(group.to_numpy(dtype='float32'))
+            for key, group in clean.groupby(STAT_KEYS, sort=False)['v']}
+
+
+# أقصى خطأ نسبي لمئينات السكتش (0.5%)
+SKETCH_ACCURACY = 0.005
+SKETCH_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+
+
+class QuantileSketch:
+    """سكتش مئينات لسعر المتر قابل للدمج والطرح (سلال لوغاريتمية بخطأ نسبي ثابت على نمط DDSketch)
+
+    كل سعر نظيف يعد في السلة ceil(log_gamma(v))، فالدمج جمع عدادات والطرح عكسه: مساهمة ملف
+    واحد تضاف أو تزال بدون الرجوع للصفوف الخام. الحجم يتبع مدى الأسعار (مئات السلال) وليس عدد
+    الصفوف. rows يعد كل الصفوف كما في المكعب، والسلال للأسعار داخل نافذة القيم المعقولة فقط.
+    """
+    __slots__ = ('offset', 'counts', 'rows')
+
+    def __init__(self, offset=0, counts=None, rows=0):
+        self.offset = int(offset)
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self.rows = int(rows)
+
+    @staticmethod
+    def buckets(values):
+        """رقم السلة لكل سعر (القيم يجب أن تكون موجبة)"""
+        return np.ceil(np.log(values) / np.log(SKETCH_GAMMA)).astype(np.int64)
+
+    @classmethod
+    def from_buckets(cls, buckets, rows=None):
+        if not len(buckets): return cls(rows=rows or 0)
+        low = int(buckets.min())
+        return cls(low, np.bincount(buckets - low), len(buckets) if rows is None else rows)
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def _combine(self, other, sign):
+        rows = self.rows + sign * other.rows
+        if not len(other.counts): return QuantileSketch(self.offset, self.counts, rows)
+        if not len(self.counts) and sign > 0: return QuantileSketch(other.offset, other.counts, rows)
+        low = min(self.offset, other.offset) if len(self.counts) else other.offset
+        high = max(self.offset + len(self.counts), other.offset + len(other.counts))
+        counts = np.zeros(high - low, dtype=np.int64)
+        counts[self.offset - low:self.offset - low + len(self.counts)] += self.counts
+        counts[other.offset - low:other.offset - low + len(other.counts)] += sign * other.counts
+        used = np.flatnonzero(counts)
+        if not len(used): return QuantileSketch(rows=rows)
+        return QuantileSketch(low + used[0], counts[used[0]:used[-1] + 1], rows)
+
+    def __add__(self, other):
+        return self._combine(other, 1)
+
+    def __sub__(self, other):
+        return self._combine(other, -1)
+
+    def quantile(self, q):
+        """المئين q (0..1) بنفس الاستكمال الخطي لـ pandas بين الرتبتين المحيطتين"""
+        total = self.count
+        if not total: return 0.0
+        rank = q * (total - 1)
+        cumulative = np.cumsum(self.counts)
+        low, high = np.searchsorted(cumulative, [np.floor(rank), np.ceil(rank)], side='right')
+        # ممثل السلة i هو 2γ^i/(γ+1): خطؤه النسبي لا يتجاوز SKETCH_ACCURACY لأي قيمة داخلها
+        value_low, value_high = 2 * SKETCH_GAMMA ** (self.offset + np.array([low, high])) / (SKETCH_GAMMA + 1)
+        return float(value_low + (value_high - value_low) * (rank - np.floor(rank)))
+
+    def stat(self):
+        """نفس شكل إحصائية المكعب (EMPTY_STAT)"""
+        if not self.count: return {**EMPTY_STAT, 'rows': self.rows}
+        return {'median': self.quantile(0.5), 'count': self.count, 'rows': self.rows,
+                **{name: self.quantile(q) for name, q in STAT_QUANTILES.items()}}
+
+    def to_list(self):
+        return [self.offset, self.counts.tolist(), self.rows]
+
+    @classmethod
+    def from_list(cls, item):
+        return cls(*item)
+
+
+def build_stat_sketches(df):
+    """سكتش لكل مفتاح في المكعب (بما فيها ALL_BUILT و ALL_TYPES) لجدول واحد، عادة ملف مصدر واحد"""
+    keys = _stat_rows(df)
+    if keys is None: return {}
+    grouped = keys.groupby(STAT_KEYS, sort=False)
+    rows = grouped.size()
+    codes = grouped.ngroup().to_numpy()
+    values = keys['v'].to_numpy()
+    clean = (values > PRICE_SQM_MIN) & (values < PRICE_SQM_MAX)
+    codes, buckets = codes[clean], QuantileSketch.buckets(values[clean])
+    order = np.argsort(codes, kind='stable')
+    codes, buckets = codes[order], buckets[order]
+    bounds = np.searchsorted(codes, np.arange(len(rows) + 1))
+    return {key: QuantileSketch.from_buckets(buckets[bounds[i]:bounds[i + 1]], int(n))
+            for i, (key, n) in enumerate(rows.items())}
+
+
+def merge_sketches(total, sketches, sign=1):
+    """إضافة (أو طرح مع sign=-1) سكتشات ملف إلى سكتشات المكعب في مكانها؛ يعيد المفاتيح المتأثرة"""
+    for key, sketch in sketches.items():
+        base = total.get(key, QuantileSketch())
+        merged = base + sketch if sign > 0 else base - sketch
+        if merged.rows > 0: total[key] = merged
+        else: total.pop(key, None)
+    return set(sketches)
+
+
+def combined_stat(sketches, districts, category, property_type):
+    """إحصائية أي تركيبة من الأحياء بدمج سكتشاتها (بدون الصفوف الخام)"""
+    merged = QuantileSketch()
+    for district in [districts] if isinstance(districts, str) else districts:
+        sketch = sketches.get((str(district), category, property_type))
+        if sketch is not None: merged = merged + sketch
+    return merged.stat()
+
+
+# ==========================================
+# 8. تقرير السحب (لكل ملف)
+# ==========================================
+REPORT_COUNTERS = ['rows_read', 'dropped_nan', 'dropped_small_area', 'dropped_unresolved_district', 'dropped_rakez', 'rows_out']
+
+
+def new_file_report(meta):
+    """سجل ملف واحد: الحجم، أزمنة التحميل والتحليل، الصفوف المستبعدة عند كل فلتر، والخطأ إن وجد"""
+    return {'file_id': meta['id'], 'name': meta['name'], 'status': 'pending', 'bytes': 0,
+            'download_s': 0.0, 'retries': 0, 'parse_s': 0.0, **{k: 0 for k in REPORT_COUNTERS}, 'error': None}
+
+
+def is_transient_error(error):
+    """أخطاء تستحق إعادة المحاولة: حالات HTTP المؤقتة وانقطاع أو بطء الاتصال"""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status is not None: return int(status) in TRANSIENT_HTTP_STATUS
+    return isinstance(error, (TimeoutError, ConnectionError))
+
+
+def write_ingestion_log(path, reports, load_error=None):
+    """إضافة تقرير هذا التحميل إلى ملف JSON lines (سطر لكل ملف)"""
+    stamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+    try:
+        with open(path, 'a', encoding='utf-8') as fh:
+            if load_error: fh.write(json.dumps({'time': stamp, 'error': load_error}, ensure_ascii=False) + '\n')
+            for report in reports:
+                fh.write(json.dumps({'time': stamp, **report}, ensure_ascii=False, default=str) + '\n')
+    except OSError: pass
+
+
+# ==========================================
+# 9. لقطات جاهزة على القرص (Arrow IPC + بيانات وصفية JSON)
+# ==========================================
+SNAPSHOT_POINTER = 'LATEST'
+SNAPSHOT_HEADER = b'snapshot_version'
+
+
+def _snapshot_paths(snapshot_dir, version):
+    base = os.path.join(snapshot_dir, f"snapshot-{version}")
+    return base + '.arrow', base + '.json'
+
+
+def latest_snapshot_version(snapshot_dir):
+    try:
+        with open(os.path.join(snapshot_dir, SNAPSHOT_POINTER), encoding='utf-8') as fh: return fh.read().strip() or None
+    except OSError: return None
+
+
+def write_snapshot(df, market_stats, snapshot_dir, keep=SNAPSHOT_KEEP, meta=None):
+    """كتابة لقطة جديدة (Arrow بدون ضغط حتى يمكن ربطها بالذاكرة) ثم تحديث مؤشر LATEST دفعة واحدة"""
+    import pyarrow as pa
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    version = time.strftime('%Y%m%dT%H%M%S') + f"-{os.getpid()}"
+    arrow_path, meta_path = _snapshot_paths(snapshot_dir, version)
+
+    # الأعمدة النصية المكررة تحفظ كقواميس (تقرأ category بدون تكلفة تحويل)
+    frame = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in frame.columns: frame[col] = frame[col].astype('category')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # رأس الملف يحمل رقم النسخة حتى يتأكد القارئ أن الملف يطابق المؤشر
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SNAPSHOT_HEADER: version.encode()})
+    with pa.OSFile(arrow_path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer: writer.write_table(table)
+    os.replace(arrow_path + '.tmp', arrow_path)
+
+    metadata = {
+        'version': version, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'rows': len(df),
+        'parser_version': PARSER_VERSION,
+        'market_stats': [[*key, stat] for key, stat in market_stats.items()],
+        **(meta or {}),
+    }
+    with open(meta_path, 'w', encoding='utf-8') as fh: json.dump(metadata, fh, ensure_ascii=False, default=str)
+
+    pointer = os.path.join(snapshot_dir, SNAPSHOT_POINTER)
+    with open(pointer + '.tmp', 'w', encoding='utf-8') as fh: fh.write(version)
+    os.replace(pointer + '.tmp', pointer)
+
+    # حذف اللقطات القديمة والإبقاء على آخر keep
+    versions = sorted(f[len('snapshot-'):-len('.arrow')] for f in os.listdir(snapshot_dir)
+                      if f.startswith('snapshot-') and f.endswith('.arrow'))
+    for old in versions[:-keep] if keep else []:
+        for path in _snapshot_paths(snapshot_dir, old):
+            try: os.remove(path)
+            except OSError: pass
+    return version
+
+
+def load_snapshot(snapshot_dir, version=None):
+    """قراءة لقطة (الأحدث افتراضياً) بربط ملف Arrow بالذاكرة؛ تعيد (الجدول، البيانات الوصفية)"""
+    import pyarrow as pa
+
+    version = version or latest_snapshot_version(snapshot_dir)
+    if not version: raise FileNotFoundError(f"لا توجد لقطة في {snapshot_dir}")
+    arrow_path, meta_path = _snapshot_paths(snapshot_dir, version)
+    with open(meta_path, encoding='utf-8') as fh: meta = json.load(fh)
+    meta['market_stats'] = {tuple(item[:3]): item[3] for item in meta.get('market_stats', [])}
+    meta['stat_sketches'] = {tuple(item[:3]): QuantileSketch.from_list(item[3]) for item in meta.get('stat_sketches', [])}
+
+    # الأعمدة تبقى على صفحات الملف المربوط بدون نسخ، فكل العمليات التي تفتح نفس اللقطة تتشارك نفس الذاكرة
+    # (حذف لقطة قديمة لا يؤثر على من ما زال يقرأها: الربط يبقى صالحاً حتى يغلق)
+    reader = pa.ipc.open_file(pa.memory_map(arrow_path, 'r'))
+    header = (reader.schema.metadata or {}).get(SNAPSHOT_HEADER)
+    if header is not None and header.decode() != version: raise ValueError(f"رأس اللقطة {header.decode()} لا يطابق {version}")
+    return reader.read_all().to_pandas(split_blocks=True), meta
+
+
+DISCOVERY_FILE = 'drive_v3_discovery.json'
+
+
+def build_drive_service(creds, cache_dir=CACHE_DIR):
+    """عميل درايف (استيراد مكتبات جوجل هنا فقط)؛ مستند الاكتشاف يحفظ في مجلد الكاش ويعاد استخدامه"""
+    from googleapiclient.discovery import build, build_from_document
+
+    path = os.path.join(cache_dir, DISCOVERY_FILE) if cache_dir else ''
+    if path and os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as fh: return build_from_document(fh.read(), credentials=creds)
+        except (OSError, ValueError): pass
+    service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as fh: json.dump(service._rootDesc, fh)
+        except (OSError, AttributeError, TypeError): pass
+    return service
+
+
 class RealEstateBot:
-    def __init__(self):
-        self.creds = self.get_creds()
-        self.service = build('drive', 'v3', credentials=self.creds)
-        self.df = self.load_data_from_drive()
+    def __init__(self, max_workers=DOWNLOAD_WORKERS, cache_dir=CACHE_DIR, compact=COMPACT_DTYPES, service=None,
+                 creds=None, snapshot_dir=SNAPSHOT_DIR, parse_workers=PARSE_WORKERS, load_deadline=LOAD_DEADLINE_SECONDS,
+                 autoload=True):
+        self.max_workers = max(1, int(max_workers))
+        self.load_deadline = load_deadline
+        # ملفات تجاوزت المهلة الكلية: file_id -> الاسم، تكمل في الخلفية وتدمج في التحديث التالي
+        self.pending = {}
+        self._late = {}
+        self._late_lock = threading.Lock()
+        self.on_late_files = None
+        self.parse_workers = max(0, int(parse_workers))
+        self._parse_pool = None
+        self.compact = compact
+        self.timings = {}
+        self.refresh_stats = {}
+        self._memory_before = None
+        self.market_stats = {}
+        # (الحي، الفئة، النوع) -> QuantileSketch: مجموع سكتشات الملفات، ومنه يشتق المكعب
+        self.stat_sketches = {}
+        self.ingestion_report = []
+        self.load_error = None
+        self._local = threading.local()
+        # file_id -> {'name', 'fingerprint', 'df'} للملفات المحملة حالياً
+        self.sources = {}
+        self.cache_dir = cache_dir
+        self.cache = FrameCache(cache_dir) if cache_dir else None
+        # وضع اللقطة: قراءة آخر لقطة Arrow من القرص بدون أي اتصال بدرايف
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_version = None
+        # service جاهز (مثل درايف وهمي للقياس) يستخدم كما هو ويفترض أنه آمن بين الخيوط
+        self.external_service = service is not None
+        self._service = service
+        self.creds = None if self.snapshot_dir else creds or (None if self.external_service else self.get_creds())
+        # autoload=False: df يبقى None إلى أن يستهلك iter_sources (تحميل تدريجي)
+        self.df = None
+        if autoload: self.df = self.load_from_snapshot() if self.snapshot_dir else self.load_data_from_drive()
+
+    @property
+    def service(self):
+        # عميل درايف يبنى عند أول طلب فعلي (بدون بيانات اعتماد لا يبنى أصلاً)
+        if self._service is None:
+            started = time.perf_counter()
+            self._service = build_drive_service(self.creds, self.cache_dir)
+            self.timings['drive_client'] = time.perf_counter() - started
+        return self._service
 
     def get_creds(self):
         if 'gcp_service_account' in st.secrets:
+            from google.oauth2 import service_account
             return service_account.Credentials.from_service_account_info(st.secrets['gcp_service_account'], scopes=SCOPES)
         return None
 
+    def list_csv_files(self):
+        results = self.service.files().list(
+            q=f"'{FOLDER_ID}' in parents and trashed=false",
+            fields="files(id, name, modifiedTime, md5Checksum, size)").execute()
+        return [f for f in results.get('files', []) if f['name'].lower().endswith('.csv')]
+
+    def _thread_http(self):
+        # كائن service غير آمن بين الخيوط، لذلك لكل عامل اتصال HTTP مفوض خاص به
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            import google_auth_httplib2, httplib2
+            http = google_auth_httplib2.AuthorizedHttp(self.creds, http=httplib2.Http(timeout=FILE_TIMEOUT_SECONDS))
+            self._local.http = http
+        return http
+
+    def download_file(self, file_id):
+        request = self.service.files().get_media(fileId=file_id)
+        if self.max_workers == 1 or self.external_service: return request.execute()
+        return request.execute(http=self._thread_http())
+
+    def download_to_file(self, file_id):
+        """تحميل على دفعات DOWNLOAD_CHUNK_BYTES إلى ملف مؤقت (في الذاكرة حتى STREAM_MIN_BYTES ثم على القرص)؛
+        يعاد من أوله. الخدمة التي لا تدعم التحميل المجزأ (بدون uri) يكتب محتواها كاملاً"""
+        request = self.service.files().get_media(fileId=file_id)
+        fh = tempfile.SpooledTemporaryFile(max_size=STREAM_MIN_BYTES)
+        try:
+            if not hasattr(request, 'uri'): fh.write(request.execute())
+            else:
+                from googleapiclient.http import MediaIoBaseDownload
+                if self.max_workers != 1 and not self.external_service: request.http = self._thread_http()
+                downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_BYTES)
+                done = False
+                while not done: _, done = downloader.next_chunk()
+        except BaseException:
+            fh.close()
+            raise
+        fh.seek(0)
+        return fh
+
+    def _cached_frame(self, meta):
+        """جدول الملف من الذاكرة أو من القرص إذا لم تتغير نسخته في درايف"""
+        fingerprint = file_fingerprint(meta)
+        if not fingerprint: return None
+        with self._late_lock: source = self._late.get(meta['id']) or self.sources.get(meta['id'])
+        if source and source['fingerprint'] == fingerprint: return source['df']
+        if self.cache: return self.cache.get(meta['id'], fingerprint)
+        return None
+
+    def _process_pool(self):
+        # عمليات التحليل تبقى حية بين التحديثات؛ spawn لأن العملية الأم فيها خيوط أخرى
+        if not self.parse_workers: return None
+        if self._parse_pool is None:
+            import multiprocessing
+            self._parse_pool = ProcessPoolExecutor(self.parse_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._parse_pool
+
+    def _timed_download(self, file_id, started_at=None, stream=False):
+        """تحميل مع إعادة المحاولة للأخطاء المؤقتة؛ يعيد (المحتوى، الزمن، عدد الإعادات)
+        stream: المحتوى ملف مؤقت (download_to_file) بدل بايتات
+        started_at: يسجل فيه وقت البدء الفعلي (بعد انتظار دوره في الخيوط) ويحذف عند انتهاء التحميل،
+        فمهلة الملف تحسب للتحميل وحده"""
+        started = time.perf_counter()
+        if started_at is not None: started_at[file_id] = started
+        try:
+            for attempt in range(DOWNLOAD_RETRIES + 1):
+                try: return (self.download_to_file if stream else self.download_file)(file_id), time.perf_counter() - started, attempt
+                except Exception as e:
+                    if attempt == DOWNLOAD_RETRIES or not is_transient_error(e): raise
+                    self._local.http = None  # اتصال جديد بعد الانقطاع
+                    time.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+        finally:
+            if started_at is not None: started_at.pop(file_id, None)
+
+    def _fetch_and_parse(self, meta, report, started_at=None):
+        """تحميل وتحليل ملف في خيط التحميل نفسه (بدون عمليات تحليل)؛ يعيد (الجدول، خطأ التحليل)
+        الملفات الكبيرة (حسب size في القائمة) تحمل إلى ملف مؤقت وتحلل منه على دفعات
+        أخطاء التحميل ترفع كما هي حتى تسجل كفشل تحميل"""
+        stream = int(meta.get('size') or 0) >= STREAM_MIN_BYTES
+        content, report['download_s'], report['retries'] = self._timed_download(meta['id'], started_at, stream=stream)
+        try:
+            report['bytes'] = content_size(content)
+            return parse_csv_file(meta['name'], content, report=report), None
+        except Exception as e: return None, e
+        finally:
+            if stream: content.close()
+
+    @staticmethod
+    def _completed_tasks(tasks, files, started_at, deadline):
+        """مثل as_completed على tasks (المستقبل -> (رقم الملف، المرحلة)) التي يضيف إليها المستهلك أثناء الدوران
+        (تحليل في عملية بعد اكتمال التحميل)، مع مهلة لكل ملف: يعيد (المستقبل، تجاوز_المهلة) فور اكتماله أو بعد
+        FILE_TIMEOUT_SECONDS من بدء تحميله (يترك في الخلفية ويعد فاشلاً)؛ FuturesTimeout عند المهلة الكلية.
+        المستهلك يحذف كل مستقبل يستلمه من tasks"""
+        while tasks:
+            now = time.perf_counter()
+            starts = dict(started_at)  # نسخة: الخيوط تضيف وتحذف أثناء الحساب
+            expiry = {f: starts[files[i]['id']] + FILE_TIMEOUT_SECONDS for f, (i, _) in tasks.items() if files[i]['id'] in starts}
+            expired = [f for f, at in expiry.items() if at <= now and not f.done()]
+            for future in expired: yield future, True
+            if not tasks: return
+            # الملف الذي لم يبدأ بعد لا تنتهي مهلته قبل FILE_TIMEOUT_SECONDS من الآن
+            timeout = min([at - now for f, at in expiry.items() if f not in expired] + [FILE_TIMEOUT_SECONDS])
+            if deadline is not None:
+                if deadline <= now: raise FuturesTimeout()
+                timeout = min(timeout, deadline - now)
+            done, _ = wait(set(tasks), timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+            for future in done: yield future, False
+
+    @staticmethod
+    def _late_frame(future, stage, meta):
+        """جدول ملف متأخر حسب المرحلة التي تجاوزت المهلة: تحميل وتحليل في الخيط، أو تحميل فقط
+        (يحلل هنا)، أو تحليل في عملية"""
+        result = future.result()
+        if stage == 'fetch':
+            frame, error = result
+            if error is not None: raise error
+            return frame
+        if stage == 'download': return parse_csv_file(meta['name'], result[0])
+        return frame_from_columnar(result[0])
+
+    def _collect_late(self, late, files):
+        """إكمال الملفات المتأخرة في الخلفية (late: المستقبل -> (رقم الملف، المرحلة))؛ تحفظ جاهزة ثم يطلب تحديث يدمجها"""
+        for future in as_completed(late):
+            i, stage = late[future]
+            meta = files[i]
+            try: frame = self._late_frame(future, stage, meta)
+            except Exception: frame = None
+            fingerprint = file_fingerprint(meta)
+            try:
+                if frame is not None and fingerprint:
+                    with self._late_lock: self._late[meta['id']] = {'name': meta['name'], 'fingerprint': fingerprint, 'df': frame}
+                    # الكاش على القرص اختياري: فشله لا يبقي الملف معلقاً
+                    if self.cache: self.cache.put(meta['id'], meta['name'], fingerprint, frame)
+            except Exception: pass
+            finally:
+                with self._late_lock: self.pending.pop(meta['id'], None)
+        if self.on_late_files: self.on_late_files()
+
     def load_data_from_drive(self):
+        """تحميل المجلد؛ الملفات التي لم تتغير منذ آخر تحميل تقرأ من الكاش"""
+        ingest = self._ingest()
+        while True:
+            try: next(ingest)
+            except StopIteration as done: return done.value
+
+    def iter_sources(self):
+        """تحميل تدريجي: (تقرير الملف، جدوله) لكل ملف فور جاهزيته (المحفوظة أولاً ثم بترتيب الوصول)؛
+        عند انتهاء المكرر يكون df والمكعب محدثين كما في refresh"""
+        if self.snapshot_dir:
+            self.df = self.load_from_snapshot()
+            return
+        self.df = yield from self._ingest()
+
+    def _ingest(self):
         all_data = []
-        if not self.creds: return pd.DataFrame()
+        if not self.creds and not self.external_service: return pd.DataFrame()
+        started = time.perf_counter()
+        stats = {'downloaded': 0, 'cached': 0, 'evicted': 0, 'failed': 0, 'late': 0}
+        deadline = started + self.load_deadline if self.load_deadline else None
+        reports = []
+        self.load_error = None
         try:
-            results = self.service.files().list(q=f"'{FOLDER_ID}' in parents and trashed=false", fields="files(id, name)").execute()
-            for file in results.get('files', []):
-                fname = file['name'].lower()
-                if not fname.endswith('.csv'): continue
+            files = self.list_csv_files()
+            self.timings['list'] = time.perf_counter() - started
+
+            frames = [None] * len(files)
+            reports = [new_file_report(meta) for meta in files]
+            pending = []
+            with self._late_lock: in_flight = set(self.pending)
+            for i, meta in enumerate(files):
+                frames[i] = self._cached_frame(meta)
+                # ملف ما زال يحمل من تحميل سابق لا يطلب مرة ثانية
+                if frames[i] is None and meta['id'] in in_flight: stats['late'] += 1
+                elif frames[i] is None: pending.append(i)
+                else:
+                    stats['cached'] += 1
+                    reports[i].update(status='cached', rows_out=len(frames[i]))
+                    yield reports[i], frames[i]
 
+            def finish(i, frame, error=None):
+                meta, report = files[i], reports[i]
+                if error is not None:
+                    stats['failed'] += 1
+                    report.update(status='failed', error=f"parse: {error!r}")
+                    return
+                frames[i] = frame
+                stats['downloaded'] += 1
+                report['status'] = 'downloaded'
+                if self.cache and file_fingerprint(meta):
+                    self.cache.put(meta['id'], meta['name'], file_fingerprint(meta), frame)
+
+            def from_worker(future, report):
                 try:
-                    # قراءة المحتوى
-                    content_bytes = self.service.files().get_media(fileId=file['id']).execute()
-                    try: content_str = content_bytes.decode('utf-8-sig')
-                    except: content_str = content_bytes.decode('utf-16')
-
-                    # 1. البحث عن سطر العناوين (Header Detection) - هذا ما سيصلح قراءة الصفقات
-                    lines = content_str.splitlines()
-                    header_idx = 0
-                    sep = ','
-                    
-                    for i, line in enumerate(lines[:50]): # نفحص أول 50 سطر
-                        # نبحث عن كلمات مفتاحية تدل على الهيدر
-                        if any(k in line for k in ['السعر', 'Price', 'قيمة', 'المساحة', 'Area']):
-                            header_idx = i
-                            sep = ';' if ';' in line else '\t' if '\t' in line else ','
-                            break
-                    
-                    # قراءة الملف من السطر الصحيح
-                    df_temp = pd.read_csv(io.StringIO(content_str), sep=sep, header=header_idx, engine='python')
-                    
-                    # توحيد الأعمدة
-                    df_temp.columns = df_temp.columns.str.strip()
-                    df_temp.rename(columns=COLUMN_MAPPING, inplace=True)
-                    
-                    # تحديد الفئة
-                    data_cat = "عروض (Ask)" if "عروض" in fname or "offer" in fname else "صفقات (Sold)"
-                    
-                    # تنظيف الأرقام
-                    for col in ['السعر', 'المساحة']:
-                        if col in df_temp.columns:
-                            df_temp[col] = pd.to_numeric(df_temp[col].astype(str).str.replace(r'[^\d.]', '', regex=True), errors='coerce')
-                    
-                    df_temp.dropna(subset=['السعر', 'المساحة'], inplace=True)
-                    df_temp = df_temp[df_temp['المساحة'] > 10]
-                    df_temp['سعر_المتر'] = df_temp['السعر'] / df_temp['المساحة']
-                    df_temp['Source_File'] = file['name']
-                    df_temp['Data_Category'] = data_cat
-                    
-                    if 'الحي' not in df_temp.columns: df_temp['الحي'] = None
-                    if 'اسم_المشروع_الخام' not in df_temp.columns: df_temp['اسم_المشروع_الخام'] = ''
-
-                    # =================================================
-                    # 1. استخراج الحي
-                    # =================================================
-                    def resolve_district(row):
-                        current_val = str(row['الحي']).strip()
-                        project_val = str(row.get('اسم_المشروع_الخام', '')).strip()
-                        file_name_val = file['name']
-                        
-                        # تنظيف اسم الملف لاستخدامه كحي
-                        clean_filename = re.sub(r'(صفقات|عروض|sold|ask|offers|deals|الرياض|riyadh|\.csv)', '', file_name_val, flags=re.IGNORECASE).strip()
-                        clean_filename = clean_filename.replace('_', ' ').replace('-', ' ').strip()
-
-                        # متى نعتبر خانة الحي سيئة ونحتاج للبديل؟
-                        bad_indicators = ['جميع', 'All', 'مشروع', 'Project', 'عام', 'راكز', 'Rakez', 'nan', 'None', 'مخطط', 'عروض', 'صفقات']
-                        is_bad = any(w in current_val for w in bad_indicators) or len(current_val) < 3
-                        
-                        candidate = current_val
-                        
-                        if is_bad:
-                            # البحث في اسم المشروع
-                            found = False
-                            for known in KNOWN_DISTRICTS:
-                                if known in project_val:
-                                    candidate = known; found = True; break
-                            
-                            if not found:
-                                # البحث في اسم الملف
-                                for known in KNOWN_DISTRICTS:
-                                    if known in file_name_val:
-                                        candidate = known; found = True; break
-                                
-                                # استخدام اسم الملف المنظف (مهم للصفقات)
-                                if not found and len(clean_filename) > 2:
-                                    candidate = clean_filename
-
-                        # 🛑 فلتر راكز: يطبق فقط على العروض (حسب طلبك)
-                        if 'Ask' in data_cat:
-                            if any(w in str(candidate).strip() for w in ['راكز', 'Rakez']):
-                                return None
-                        
-                        # تنظيف عام للكلمات المتبقية
-                        if any(w == str(candidate).strip() for w in ['عروض', 'Offers', 'صفقات', 'Sold']):
-                            return None
-
-                        return candidate
-
-                    df_temp['الحي'] = df_temp.apply(resolve_district, axis=1)
-                    df_temp.dropna(subset=['الحي'], inplace=True)
-
-                    # =================================================
-                    # 2. تصنيف العقار
-                    # =================================================
-                    def final_classify(row):
-                        raw = str(row.get('نوع_العقار_الخام', '')).strip().lower()
-                        area = row.get('المساحة', 0)
-                        
-                        if 'صفقات' in data_cat or 'Sold' in data_cat:
-                            # الصفقات: أرض أو مبني
-                            if any(w in raw for w in ['أرض', 'land', 'راس', 'قطعة']): return "أرض"
-                            return "مبني"
-                        else:
-                            # العروض: التفصيل
-                            if any(w in raw for w in ['أرض', 'land', 'راس', 'قطعة']): return "أرض"
-                            if any(w in raw for w in ['فيلا', 'فله', 'فلل', 'villa', 'تاون', 'town', 'بنتهاوس', 'penthouse', 'دبلكس']): return "فيلا"
-                            if any(w in raw for w in ['شقة', 'شقه', 'شقق', 'apartment', 'flat', 'تمليك', 'استوديو']): return "شقة"
-                            if any(w in raw for w in ['دور', 'طابق', 'floor', 'ادوار', 'أدوار']): return "دور"
-                            
-                            # التصنيف بالمساحة
-                            if area < 200: return "شقة"        
-                            if 200 <= area < 360: return "دور" 
-                            return "فيلا"                      
-
-                    df_temp['نوع_العقار'] = df_temp.apply(final_classify, axis=1)
-                    
-                    cols = ['Source_File', 'Data_Category', 'الحي', 'السعر', 'المساحة', 'سعر_المتر', 'نوع_العقار', 'نوع_العقار_الخام']
-                    existing_cols = [c for c in cols if c in df_temp.columns]
-                    all_data.append(df_temp[existing_cols])
-
-                except Exception: continue
-        except Exception: pass
-        
-        if all_data: return pd.concat(all_data, ignore_index=True)
-        return pd.DataFrame()
+                    payload, worker_report = future.result()
+                    report.update(worker_report)
+                    return frame_from_columnar(payload), None
+                except Exception as e: return None, e
+
+            def hand_over(late):
+                # ما لم يكتمل قبل المهلة الكلية (تحميلاً أو تحليلاً) يكمل في الخلفية ويبقى pending
+                stats['late'] += len(late)
+                with self._late_lock: self.pending.update({files[i]['id']: files[i]['name'] for i, _ in late.values()})
+                threading.Thread(target=self._collect_late, args=(late, files), name='late-files', daemon=True).start()
+
+            # التحميل بالتوازي للملفات الجديدة أو المعدلة فقط، وكل خيط يحلل ملفه فور وصوله
+            # (أو يرسله لعمليات التحليل إذا حدد parse_workers)؛ التحميلات والتحليلات تنتظر معاً فيعرض
+            # كل ملف فور جاهزيته، والمهلة الكلية تشمل التحليل أيضاً
+            # النتائج تحفظ بترتيب القائمة حتى تطابق المسار التسلسلي تماماً
+            parse_pool = self._process_pool()
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            started_at = {}
+            if parse_pool is not None: tasks = {pool.submit(self._timed_download, files[i]['id'], started_at): (i, 'download') for i in pending}
+            else: tasks = {pool.submit(self._fetch_and_parse, files[i], reports[i], started_at): (i, 'fetch') for i in pending}
+            try:
+                for future, expired in self._completed_tasks(tasks, files, started_at, deadline):
+                    i, stage = tasks.pop(future)
+                    meta, report = files[i], reports[i]
+                    if expired:
+                        stats['failed'] += 1
+                        report.update(status='failed', download_s=float(FILE_TIMEOUT_SECONDS),
+                                      error=f"download: timeout after {FILE_TIMEOUT_SECONDS}s")
+                        continue
+                    if stage == 'parse': finish(i, *from_worker(future, report))
+                    else:
+                        try: result = future.result()
+                        except Exception as e:
+                            stats['failed'] += 1
+                            report.update(status='failed', error=f"download: {e!r}")
+                            continue
+                        if stage == 'download':
+                            content, report['download_s'], report['retries'] = result
+                            report['bytes'] = len(content)
+                            tasks[parse_pool.submit(parse_file_columnar, meta['name'], content)] = (i, 'parse')
+                            continue
+                        finish(i, *result)
+                    if frames[i] is not None: yield report, frames[i]
+            except FuturesTimeout: hand_over(dict(tasks))
+            finally: pool.shutdown(wait=False)
+
+            # تحديث قائمة المصادر وحذف الملفات التي اختفت من المجلد
+            live_ids = {meta['id'] for meta in files}
+            stats['evicted'] = len([fid for fid in self.sources if fid not in live_ids])
+            previous = self.sources
+            self.sources = {
+                meta['id']: {'name': meta['name'], 'fingerprint': file_fingerprint(meta), 'df': frames[i]}
+                for i, meta in enumerate(files) if frames[i] is not None
+            }
+            # الملفات المتأخرة التي دخلت في هذا التحميل لا تحفظ مرتين
+            with self._late_lock:
+                self._late = {fid: src for fid, src in self._late.items()
+                              if fid in live_ids and self.sources.get(fid, {}).get('df') is not src['df']}
+            self._update_stats(previous)
+            if self.cache: stats['evicted'] = max(stats['evicted'], len(self.cache.evict(live_ids)))
+            all_data = [f for f in frames if f is not None]
+        except Exception as e:
+            # فشل عام (القائمة أو الاتصال): يسجل بدل أن يختفي
+            self.load_error = repr(e)
+        self.timings['total'] = time.perf_counter() - started
+        self.refresh_stats = stats
+        self.ingestion_report = reports
+        if INGESTION_LOG: write_ingestion_log(INGESTION_LOG, reports, self.load_error)
+
+        if not all_data:
+            self.market_stats, self.stat_sketches = {}, {}
+            return pd.DataFrame()
+        df = pd.concat(all_data, ignore_index=True)
+        self._memory_before = column_memory(df)
+        if self.compact: df = compact_frame(df)
+        return df
+
+    def _update_stats(self, previous):
+        """المكعب من سكتشات الملفات: كل ملف يحسب سكتشاته مرة عند دخوله، والتحديث يطرح مساهمة الملفات
+        التي تغيرت أو حذفت ويضيف الجديدة (نفس الجدول في الذاكرة = لم يتغير)، ثم يعيد حساب المفاتيح المتأثرة فقط"""
+        started = time.perf_counter()
+        for fid, source in self.sources.items():
+            old = previous.get(fid)
+            unchanged = old is not None and old['df'] is source['df'] and 'sketches' in old
+            source['sketches'] = old['sketches'] if unchanged else build_stat_sketches(source['df'])
+
+        sketches = dict(self.stat_sketches)
+        if not sketches:
+            for source in self.sources.values(): merge_sketches(sketches, source['sketches'])
+            self.market_stats = {key: sketch.stat() for key, sketch in sketches.items()}
+        else:
+            affected = set()
+            for fid in set(previous) | set(self.sources):
+                old, new = previous.get(fid), self.sources.get(fid)
+                if old is not None and new is not None and old['df'] is new['df']: continue
+                if old is not None: affected |= merge_sketches(sketches, old.get('sketches', {}), sign=-1)
+                if new is not None: affected |= merge_sketches(sketches, new['sketches'])
+            market_stats = {key: stat for key, stat in self.market_stats.items() if key not in affected}
+            market_stats.update({key: sketches[key].stat() for key in affected if key in sketches})
+            self.market_stats = market_stats
+        self.stat_sketches = sketches
+        self.timings['market_stats'] = time.perf_counter() - started
+
+    def refresh(self):
+        """تحديث تزايدي: تحميل الملفات الجديدة أو المعدلة فقط (أو أحدث لقطة في وضع اللقطة)"""
+        if self.snapshot_dir:
+            if latest_snapshot_version(self.snapshot_dir) != self.snapshot_version: self.df = self.load_from_snapshot()
+            return self.df
+        self.df = self.load_data_from_drive()
+        return self.df
+
+    def load_from_snapshot(self):
+        """آخر لقطة مكتوبة على القرص (ملف Arrow مربوط بالذاكرة) مع مكعب الإحصائيات المحفوظ معها"""
+        started = time.perf_counter()
+        self.load_error = None
+        try: df, meta = load_snapshot(self.snapshot_dir)
+        except Exception as e:
+            self.load_error = f"snapshot: {e!r}"
+            return pd.DataFrame()
+        self.snapshot_version = meta['version']
+        self.market_stats = meta['market_stats']
+        self.stat_sketches = meta['stat_sketches']
+        self.ingestion_report = meta.get('ingestion_report', [])
+        self.refresh_stats = meta.get('refresh_stats', {})
+        self.timings = {**meta.get('timings', {}), 'snapshot_load': time.perf_counter() - started}
+        return df
+
+    def write_snapshot(self, snapshot_dir, keep=SNAPSHOT_KEEP):
+        """حفظ البيانات الحالية كلقطة جديدة"""
+        return write_snapshot(self.df, self.market_stats, snapshot_dir, keep=keep, meta={
+            'stat_sketches': [[*key, sketch.to_list()] for key, sketch in self.stat_sketches.items()],
+            'ingestion_report': self.ingestion_report, 'refresh_stats': self.refresh_stats, 'timings': self.timings})
+
+    def market_stat(self, district, category, property_type):
+        """إحصائية جاهزة من المكعب: الوسيط والعدد والمئينات (أصفار عند عدم وجود بيانات)"""
+        return self.market_stats.get((str(district), category, property_type), EMPTY_STAT)
+
+    def combined_stat(self, districts, category, property_type):
+        """الوسيط والمئينات لمجموعة أحياء معاً من السكتشات"""
+        return combined_stat(self.stat_sketches, districts, category, property_type)
+
+    def snapshot(self, version=0):
+        """لقطة ثابتة من البيانات الحالية للقراءة بينما يستمر التحديث"""
+        with self._late_lock: pending = dict(self.pending)
+        return DataSnapshot(self.df, self.market_stats, version=version, stat_sketches=self.stat_sketches,
+                            refresh_stats=dict(self.refresh_stats), timings=dict(self.timings),
+                            ingestion_report=[dict(r) for r in self.ingestion_report], pending=pending)
+
+    def memory_report(self):
+        """استهلاك الذاكرة لكل عمود قبل وبعد الضغط"""
+        after = column_memory(self.df)
+        before = self._memory_before if self._memory_before is not None else after
+        report = pd.DataFrame({
+            'dtype': self.df.dtypes.astype(str),
+            'bytes_before': before.reindex(after.index),
+            'bytes_after': after,
+        })
+        report.loc['الإجمالي'] = ['', report['bytes_before'].sum(), report['bytes_after'].sum()]
+        report['ratio'] = report['bytes_after'] / report['bytes_before']
+        return report
+
+
+# ==========================================
+# 10. فهرس الفلترة (حي × فئة × نوع × ملف + نطاقات الأسعار)
+# ==========================================
+# اسم الفلتر -> العمود
+INDEX_DIMENSIONS = {'district': 'الحي', 'category': 'Data_Category', 'property_type': 'نوع_العقار', 'source_file': 'Source_File'}
+INDEX_RANGES = {'price': 'السعر', 'area': 'المساحة', 'price_sqm': 'سعر_المتر'}
+
+
+class FilterIndex:
+    """فهرس يبنى مرة لكل لقطة: مواقع الصفوف لكل قيمة، ومصفوفات مرتبة للبحث الثنائي في النطاقات
+
+    الاستعلام يبدأ من أضيق شرط (أقصر قائمة مواقع أو أضيق نطاق) ثم يفحص باقي الشروط على
+    هذه المواقع فقط، فالتكلفة تتبع حجم النتيجة وليس حجم الجدول.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.codes, self.values, self.postings = {}, {}, {}
+        for name, col in INDEX_DIMENSIONS.items():
+            if col not in df.columns: continue
+            codes, uniques = pd.factorize(df[col].astype(str).to_numpy(dtype=object))
+            order = np.argsort(codes, kind='stable').astype(np.int64)
+            bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+            self.codes[name] = codes
+            self.values[name] = {value: i for i, value in enumerate(uniques)}
+            self.postings[name] = np.split(order, bounds[:-1]) if len(uniques) else []
+
+        self.numbers, self.order, self.sorted, self.rank = {}, {}, {}, {}
+        for name, col in INDEX_RANGES.items():
+            if col not in df.columns: continue
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+            order = np.argsort(values, kind='stable')
+            self.numbers[name] = values
+            self.order[name] = order
+            self.sorted[name] = values[order]
+            # ترتيب كل صف داخل العمود: يكفي لترتيب أي نتيجة فلترة دون إعادة الفرز الكامل
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            self.rank[name] = rank
+
+        # إجماليات جاهزة لكل (حي، فئة) لعدادات الملخص
+        self.totals = {}
+        if 'district' in self.codes and 'category' in self.codes:
+            n_cat = len(self.values['category'])
+            combined = np.bincount(self.codes['district'] * n_cat + self.codes['category'],
+                                   minlength=len(self.values['district']) * n_cat).reshape(-1, n_cat)
+            self.totals = {(d, c): int(combined[di, ci]) for d, di in self.values['district'].items()
+                           for c, ci in self.values['category'].items()}
+
+    def distinct(self, name):
+        """القيم المتاحة لفلتر معين مرتبة"""
+        return sorted(self.values.get(name, {}))
+
+    def value_range(self, name):
+        """أصغر وأكبر قيمة (بدون NaN) لعمود رقمي"""
+        values = self.sorted.get(name)
+        if values is None: return 0.0, 0.0
+        valid = values[~np.isnan(values)]
+        return (float(valid[0]), float(valid[-1])) if len(valid) else (0.0, 0.0)
+
+    def _range_slice(self, name, bounds):
+        low, high = bounds
+        values = self.sorted[name]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        stop = np.searchsorted(values, np.inf if high is None else high, side='right')
+        return start, stop
+
+    def positions(self, **filters):
+        """مواقع الصفوف (مرتبة) المطابقة لكل الفلاتر
+
+        فلاتر القيم: district, category, property_type, source_file (قيمة أو قائمة قيم؛ None = الكل)
+        فلاتر النطاق: price, area, price_sqm على شكل (من، إلى) شاملة؛ None لأي طرف = مفتوح
+        """
+        equals, ranges = {}, {}
+        for name, wanted in filters.items():
+            if wanted is None: continue
+            if name in INDEX_RANGES:
+                if name in self.sorted and wanted != (None, None): ranges[name] = wanted
+                continue
+            if name not in INDEX_DIMENSIONS: raise KeyError(name)
+            wanted = [wanted] if isinstance(wanted, str) else list(wanted)
+            if name not in self.values: return np.empty(0, dtype=np.int64)
+            equals[name] = [self.values[name][w] for w in wanted if w in self.values[name]]
+            if not equals[name]: return np.empty(0, dtype=np.int64)
+
+        # حجم كل شرط لاختيار الأضيق كنقطة بداية
+        sizes = {name: sum(len(self.postings[name][c]) for c in codes) for name, codes in equals.items()}
+        slices = {name: self._range_slice(name, bounds) for name, bounds in ranges.items()}
+        sizes.update({name: max(0, stop - start) for name, (start, stop) in slices.items()})
+        if not sizes: return np.arange(self.size, dtype=np.int64)
+
+        driver = min(sizes, key=sizes.get)
+        if driver in equals: rows = np.concatenate([self.postings[driver][c] for c in equals[driver]])
+        else: rows = self.order[driver][slice(*slices[driver])]
+
+        # باقي الشروط تفحص على صفوف البداية فقط
+        for name, codes in equals.items():
+            if name == driver: continue
+            keep = np.isin(self.codes[name][rows], codes) if len(codes) > 1 else self.codes[name][rows] == codes[0]
+            rows = rows[keep]
+        for name, (low, high) in ranges.items():
+            if name == driver: continue
+            values = self.numbers[name][rows]
+            keep = ~np.isnan(values)
+            if low is not None: keep &= values >= low
+            if high is not None: keep &= values <= high
+            rows = rows[keep]
+        return np.sort(rows)
+
+    def count(self, **filters):
+        """عدد الصفوف؛ فلاتر الحي والفئة وحدها تقرأ من الإجماليات الجاهزة"""
+        active = {k: v for k, v in filters.items() if v is not None and v != (None, None)}
+        if set(active) <= {'district', 'category'} and self.totals and all(isinstance(v, str) for v in active.values()):
+            districts = [active['district']] if 'district' in active else list(self.values['district'])
+            categories = [active['category']] if 'category' in active else list(self.values['category'])
+            return sum(self.totals.get((d, c), 0) for d in districts for c in categories)
+        return len(self.positions(**filters))
+
+    def sort_rows(self, rows, by, descending=False):
+        """ترتيب نتيجة فلترة حسب سعر المتر أو السعر أو المساحة باستخدام الترتيب المخزن"""
+        if by not in self.rank: return rows
+        if len(rows) == self.size: ordered = self.order[by]
+        else: ordered = rows[np.argsort(self.rank[by][rows], kind='stable')]
+        return ordered[::-1] if descending else ordered
+
+    @staticmethod
+    def take(df, rows):
+        return df.iloc[rows]
+
+
+# ==========================================
+# 11. البحث عن المقارنات (حي × فئة × نوع مرتبة بالمساحة)
+# ==========================================
+# أحياء متجاورة تستخدم عند قلة المقارنات في الحي نفسه؛ يمكن استبدالها بملف JSON {حي: [جيران]}
+NEIGHBOR_DISTRICTS = {
+    'الملقا': ['حطين', 'الياسمين', 'الصحافة', 'العقيق', 'القيروان'],
+    'حطين': ['الملقا', 'القيروان', 'العقيق'],
+    'الياسمين': ['الملقا', 'النرجس', 'الصحافة', 'الربيع'],
+    'النرجس': ['الياسمين', 'العارض', 'القيروان'],
+    'القيروان': ['حطين', 'الملقا', 'النرجس', 'العارض'],
+    'العارض': ['النرجس', 'القيروان'],
+    'الصحافة': ['الياسمين', 'الملقا', 'الربيع', 'العقيق'],
+    'العقيق': ['الملقا', 'الصحافة', 'حطين', 'النخيل'],
+    'الربيع': ['الصحافة', 'الياسمين', 'الندى', 'النخيل'],
+}
+
+
+def load_neighbor_districts(path, default=None):
+    """جدول الجيران من ملف JSON {حي: [جيران]}؛ ملف مفقود أو تالف لا يوقف التطبيق ويعاد الجدول الافتراضي"""
+    default = NEIGHBOR_DISTRICTS if default is None else default
+    try:
+        with open(path, encoding='utf-8') as fh: table = json.load(fh)
+    except (OSError, ValueError): return default
+    if not isinstance(table, dict): return default
+    return {str(k): [str(n) for n in v] for k, v in table.items() if isinstance(v, list)}
+
+
+if os.environ.get('DISTRICT_NEIGHBORS_FILE'): NEIGHBOR_DISTRICTS = load_neighbor_districts(os.environ['DISTRICT_NEIGHBORS_FILE'])
+# أقصى فرق في المساحة (±%) حتى يعد العقار مقارناً
+COMPS_WINDOW_PCT = 30
+
+
+class CompsIndex:
+    """لكل (حي، فئة، نوع) مساحات مرتبة مع سعر المتر وموقع الصف بنفس الترتيب (مبني على أكواد FilterIndex)
+
+    البحث الثنائي يحدد موضع المساحة المطلوبة ونافذة ±COMPS_WINDOW_PCT، وأقرب N تقع حتماً
+    ضمن N موضعاً على كل جانب، فالتكلفة لا تتعلق بحجم الجدول.
+    """
+
+    def __init__(self, index):
+        self.groups = {}
+        self.rows = np.empty(0, dtype=np.int64)
+        self.area = self.price_sqm = np.empty(0)
+        self.district_codes = np.empty(0, dtype=np.int64)
+        self.district_values = index.values.get('district', {})
+        self.types = list(index.values.get('property_type', {}))
+        if not {'district', 'category', 'property_type'} <= set(index.codes) or 'area' not in index.numbers: return
+
+        names = {k: list(index.values[k]) for k in ('district', 'category', 'property_type')}
+        n_cat, n_type = len(names['category']), len(names['property_type'])
+        group = (index.codes['district'].astype(np.int64) * n_cat + index.codes['category']) * n_type + index.codes['property_type']
+        area = index.numbers['area']
+        valid = np.flatnonzero(~np.isnan(area))
+        order = valid[np.lexsort((area[valid], group[valid]))]
+        self.rows = order
+        self.area = area[order]
+        self.price_sqm = index.numbers['price_sqm'][order] if 'price_sqm' in index.numbers else np.full(len(order), np.nan)
+        self.district_codes = index.codes['district'][order]
+
+        g = group[order]
+        starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if len(g) else np.empty(0, dtype=np.int64)
+        stops = np.r_[starts[1:], len(g)]
+        for start, stop in zip(starts, stops):
+            code = int(g[start])
+            key = (names['district'][code // (n_cat * n_type)], names['category'][code // n_type % n_cat], names['property_type'][code % n_type])
+            self.groups[key] = (int(start), int(stop))
+
+    def _window(self, key, area, n, window_pct):
+        span = self.groups.get(key)
+        if span is None: return np.empty(0, dtype=np.int64)
+        start, stop = span
+        values = self.area[start:stop]
+        low = np.searchsorted(values, area * (1 - window_pct / 100), side='left')
+        high = np.searchsorted(values, area * (1 + window_pct / 100), side='right')
+        mid = np.searchsorted(values, area)
+        return np.arange(start + max(low, mid - n), start + min(high, mid + n))
+
+    def _closest(self, districts, category, types, area, n, window_pct):
+        found = [self._window((d, category, t), area, n, window_pct) for d in districts for t in types]
+        found = np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        if len(found) > n: found = found[np.argsort(np.abs(self.area[found] - area), kind='stable')[:n]]
+        return found
+
+    def search(self, district, area, property_type=None, categories=(SOLD_CATEGORY, ASK_CATEGORY), n=10,
+               window_pct=COMPS_WINDOW_PCT, neighbors=None):
+        """أقرب n لكل فئة: {فئة: مواضع داخل مصفوفات الفهرس}؛ إذا كانت أقل من n في الحي تكمل من الجيران
+        (نوع مبنى محدد يبحث في الصفقات ضمن "مبني" لأنها لا تميز أنواع المباني)"""
+        neighbors = NEIGHBOR_DISTRICTS.get(district, []) if neighbors is None else neighbors
+        picked = {}
+        for category in categories:
+            types = [category_property_type(category, property_type)] if property_type else self.types
+            own = self._closest([district], category, types, area, n, window_pct)
+            if len(own) < n and neighbors:
+                own = np.concatenate([own, self._closest(neighbors, category, types, area, n - len(own), window_pct)])
+            picked[category] = own
+        return picked
+
+    def summary(self, district, positions):
+        """عدد المقارنات (ومنها من الجيران) والوسيط والربيعيات لسعر المتر بعد استبعاد القيم الخيالية"""
+        prices = clean_price_values(pd.Series(self.price_sqm[positions]))
+        home = self.district_values.get(str(district), -1)
+        stat = {'count': len(positions), 'neighbors': int((self.district_codes[positions] != home).sum()),
+                'median': float(prices.median()) if len(prices) else 0.0}
+        for key in ('p25', 'p75'): stat[key] = float(prices.quantile(STAT_QUANTILES[key])) if len(prices) else 0.0
+        return stat
+
+
+# ==========================================
+# 12. البيانات المشتركة على مستوى العملية
+# ==========================================
+class DataSnapshot:
+    """نسخة ثابتة من الجدول والمكعب؛ لا تتغير بعد إنشائها فيقرأها أي عدد من الجلسات بأمان"""
+
+    def __init__(self, df, market_stats, version=0, refresh_stats=None, timings=None, ingestion_report=None, pending=None,
+                 stat_sketches=None):
+        self.df = df
+        self.market_stats = market_stats
+        self.stat_sketches = stat_sketches or {}
+        self.version = version
+        self.refresh_stats = refresh_stats or {}
+        self.timings = timings or {}
+        self.ingestion_report = ingestion_report or []
+        # ملفات لم تكتمل قبل المهلة (file_id -> الاسم)؛ البيانات جزئية إلى أن تدمج
+        self.pending = pending or {}
+        self.loaded_at = time.time()
+        self._derived = {}
+        self._derived_lock = threading.RLock()
+
+    @property
+    def partial(self):
+        return bool(self.pending)
+
+    def _lazy(self, name, builder):
+        """هياكل مشتقة من الجدول (عينات، فهارس) تبنى مرة واحدة لكل لقطة عند أول طلب"""
+        value = self._derived.get(name)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(name)
+                if value is None: value = self._derived[name] = builder(self.df)
+        return value
+
+    def market_stat(self, district, category, property_type):
+        return self.market_stats.get((str(district), category, property_type), EMPTY_STAT)
+
+    def combined_stat(self, districts, category, property_type):
+        return combined_stat(self.stat_sketches, districts, category, property_type)
+
+    def price_samples(self, district, category, property_type):
+        """أسعار المتر النظيفة لمجموعة واحدة"""
+        samples = self._lazy('price_samples', build_price_samples)
+        return samples.get((str(district), category, property_type), np.empty(0, dtype='float32'))
+
+    @property
+    def index(self):
+        return self._lazy('filter_index', FilterIndex)
+
+    @property
+    def comps_index(self):
+        return self._lazy('comps_index', lambda df: CompsIndex(self.index))
+
+    def comps(self, district, area, property_type=None, n=10, window_pct=COMPS_WINDOW_PCT, neighbors=None):
+        """أقرب n صفقة وn عرض بالمساحة في الحي (ثم الجيران)؛ يعيد (الصفوف، ملخص سعر المتر لكل فئة)"""
+        if self.df.empty: return self.df, {}
+        comps = self.comps_index
+        picked = comps.search(district, area, property_type, n=n, window_pct=window_pct, neighbors=neighbors)
+        found = np.concatenate(list(picked.values()))
+        rows = self.df.iloc[comps.rows[found]].copy()
+        rows['فرق_المساحة_%'] = (comps.area[found] / area - 1) * 100 if area else np.nan
+        summary = {category: {**comps.summary(district, positions), 'property_type': category_property_type(category, property_type)}
+                   for category, positions in picked.items() if len(positions)}
+        return rows, summary
+
+    @property
+    def districts(self):
+        """قائمة الأحياء المرتبة (تحسب مرة واحدة لكل لقطة)"""
+        return self._lazy('districts', lambda df: self.index.distinct('district'))
+
+    def query(self, **filters):
+        """الصفوف المطابقة للفلاتر عبر الفهرس (انظر FilterIndex.positions)"""
+        return self.index.take(self.df, self.index.positions(**filters))
+
+    def count(self, **filters):
+        return self.index.count(**filters)
+
+    def page(self, by='price_sqm', descending=False, page=1, page_size=50, **filters):
+        """صفحة واحدة من النتيجة مرتبة؛ فقط صفوف الصفحة تستخرج من الجدول. تعيد (الصفحة، العدد الكلي)"""
+        rows = self.index.positions(**filters)
+        ordered = self.index.sort_rows(rows, by, descending)
+        start = max(0, (page - 1) * page_size)
+        return self.index.take(self.df, ordered[start:start + page_size]), len(rows)
+
+    @property
+    def age(self):
+        return time.time() - self.loaded_at
+
+    def age_label(self):
+        minutes = int(self.age // 60)
+        if minutes < 1: return "الآن"
+        if minutes < 60: return f"قبل {minutes} دقيقة"
+        return f"قبل {minutes // 60} ساعة و {minutes % 60} دقيقة"
+
+
+class SharedDataset:
+    """بوت واحد لكل عملية: القراء يأخذون آخر لقطة فوراً، والتحديث يجري في خيط خلفي ثم تستبدل اللقطة دفعة واحدة"""
+
+    def __init__(self, ttl=DATA_TTL_SECONDS, bot_factory=None):
+        self.ttl = ttl
+        self.bot_factory = bot_factory or functools.partial(RealEstateBot, autoload=False)
+        self.bot = None
+        self.last_error = None
+        self._snapshot = None
+        self._version = 0
+        self._last_attempt = 0.0
+        self._load_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread = None
+        self._refresh_again = False
+        # الملفات الجاهزة أثناء التحميل الأول (تقرير، جدول) للعرض التدريجي قبل اكتمال اللقطة
+        self.progress = []
+        self._progress_lock = threading.Lock()
+        self._progress_seen = 0
+        self._progress_df = pd.DataFrame()
+
+    @property
+    def is_loaded(self):
+        return self._snapshot is not None
+
+    @property
+    def refreshing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def snapshot(self):
+        """آخر لقطة؛ أول طلب فقط ينتظر التحميل، وبعدها اللقطة القديمة تخدم القراء أثناء التحديث"""
+        snap = self._snapshot
+        if snap is None:
+            with self._load_lock:
+                if self._snapshot is None: self._load()
+            return self._snapshot or DataSnapshot(pd.DataFrame(), {})
+        if time.time() - self._last_attempt > self.ttl: self.refresh_async()
+        return snap
+
+    def prefetch(self):
+        """بدء التحميل الأول في الخلفية بدون انتظار (الصفحة ترسم ما لا يحتاج بيانات أثناء ذلك)"""
+        if self._snapshot is None and not self._load_lock.locked(): self.refresh_async()
+
+    def refresh_async(self):
+        """تشغيل تحديث في الخلفية؛ إن كان هناك تحديث جارٍ يعاد مرة واحدة بعده (مثلاً عند وصول ملفات متأخرة)"""
+        with self._thread_lock:
+            if self.refreshing:
+                self._refresh_again = True
+                return False
+            self._thread = threading.Thread(target=self._refresh_worker, name='dataset-refresh', daemon=True)
+            self._thread.start()
+        return True
+
+    def _refresh_worker(self):
+        while True:
+            with self._load_lock: self._load()
+            with self._thread_lock:
+                if not self._refresh_again:
+                    self._thread = None
+                    return
+                self._refresh_again = False
+
+    def _load(self):
+        self._last_attempt = time.time()
+        try:
+            if self.bot is None:
+                bot = self.bot_factory()
+                # الملفات المتأخرة عند اكتمالها تدمج بتحديث في الخلفية
+                if hasattr(bot, 'on_late_files'): bot.on_late_files = self.refresh_async
+                if getattr(bot, 'df', None) is None:
+                    with self._progress_lock: self.progress, self._progress_seen, self._progress_df = [], 0, pd.DataFrame()
+                    for item in bot.iter_sources(): self.progress.append(item)
+                self.bot = bot
+            else:
+                previous = self.bot.df
+                self.bot.refresh()
+                # لا جديد (مثلاً لم تنشر لقطة جديدة): نبقي اللقطة الحالية بفهارسها
+                if self.bot.df is previous and self._snapshot is not None:
+                    self.last_error = None
+                    return
+            fresh = self.bot.snapshot(version=self._version + 1)
+        except Exception as e:
+            self.last_error = repr(e)
+            return
+        # فشل التحديث بالكامل (مثلاً انقطاع الاتصال) لا يمسح البيانات المعروضة
+        if fresh.df.empty and self._snapshot is not None and not self._snapshot.df.empty:
+            self.last_error = getattr(self.bot, 'load_error', None) or "التحديث أعاد جدولاً فارغاً؛ تم الإبقاء على اللقطة السابقة"
+            return
+        self.last_error = None
+        self._version = fresh.version
+        self._snapshot = fresh
+        with self._progress_lock:
+            self.progress, self._progress_seen, self._progress_df = [], 0, pd.DataFrame()
+
+    def progress_view(self):
+        """ما اكتمل حتى الآن في التحميل الأول: (تقارير الملفات الجاهزة، جدول مجمع لها) - الدمج تزايدي"""
+        with self._progress_lock:
+            items = self.progress[self._progress_seen:]
+            if items:
+                parts = ([self._progress_df] if self._progress_seen else []) + [frame for _, frame in items]
+                self._progress_df = pd.concat(parts, ignore_index=True)
+                self._progress_seen += len(items)
+            return [report for report, _ in self.progress[:self._progress_seen]], self._progress_df
+
+
+_shared_dataset = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_dataset():
+    """حامل البيانات المشترك بين كل الجلسات في هذه العملية"""
+    global _shared_dataset
+    with _shared_lock:
+        if _shared_dataset is None: _shared_dataset = SharedDataset(ttl=SNAPSHOT_POLL_SECONDS if SNAPSHOT_DIR else DATA_TTL_SECONDS)
+        return _shared_dataset
+
+
+# زمن استيراد هذه الوحدة (مع streamlit و pandas) في أول تشغيل للعملية؛ يعرض مع APP_PROFILE
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
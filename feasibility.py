@@ -0,0 +1,118 @@
+import numpy as np
+
+# ==========================================
+# 1. نموذج التكاليف (يقبل أرقاماً مفردة أو مصفوفات NumPy)
+# ==========================================
+CONTINGENCY_PCT = 2.0   # احتياطي طوارئ
+MALATH_PCT = 1.0        # تأمين ملاذ من تكلفة العظم
+
+
+def cost_model(land_area, land_price, tax_pct, saei_pct, build_ratio, turnkey_price, bone_price,
+               units, services, permits, marketing_pct, wafi_fees=0):
+    """بنود التكلفة لمشروع واحد أو لشبكة كاملة من السيناريوهات (broadcasting)"""
+    bua = land_area * build_ratio  # مسطح البناء
+
+    # تكاليف الأرض
+    base_land = land_area * land_price
+    land_total = base_land * (1 + (tax_pct + saei_pct) / 100)
+
+    # تكاليف البناء
+    build_total = bua * turnkey_price
+    malath = (bua * bone_price) * (MALATH_PCT / 100)
+
+    # تكاليف أخرى
+    services_total = units * services
+    sub_total = land_total + build_total + malath + services_total + permits + wafi_fees
+
+    # طوارئ وتسويق
+    contingency = sub_total * (CONTINGENCY_PCT / 100)
+    marketing = (sub_total + contingency) * (marketing_pct / 100)
+
+    grand_total = sub_total + contingency + marketing
+    return {
+        'bua': bua, 'land_total': land_total, 'build_total': build_total, 'malath': malath,
+        'services_total': services_total, 'sub_total': sub_total, 'contingency': contingency,
+        'marketing': marketing, 'grand_total': grand_total,
+        'cost_sqm': grand_total / bua,  # تكلفة المتر البيعي (على المسطح)
+    }
+
+
+def margin_pct(market_price, cost_sqm):
+    """هامش الربح % مقابل سعر السوق (NaN عند عدم وجود سعر سوق)"""
+    market_price = np.asarray(market_price, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin = (market_price - cost_sqm) / cost_sqm * 100
+    return np.where(market_price > 0, margin, np.nan)
+
+
+# ==========================================
+# 2. شبكة الحساسية (سعر الأرض × معامل البناء × سعر التنفيذ × عدد الوحدات)
+# ==========================================
+GRID_AXES = ['land_price', 'build_ratio', 'turnkey_price', 'units']
+
+
+def sensitivity_grid(inputs, land_prices, build_ratios, turnkey_prices, units=None, market_prices=None):
+    """تقييم نموذج التكاليف على كل تركيبة من المحاور دفعة واحدة
+
+    inputs: مدخلات السيناريو الأساسي (نفس أسماء cost_model)
+    market_prices: {اسم: سعر المتر في السوق} لحساب الهامش لكل خلية
+    يعيد المحاور و cost_sqm بشكل (أرض، معامل، تنفيذ، وحدات) والهامش لكل سعر سوق
+    """
+    axes = {
+        'land_price': np.asarray(land_prices, dtype=float),
+        'build_ratio': np.asarray(build_ratios, dtype=float),
+        'turnkey_price': np.asarray(turnkey_prices, dtype=float),
+        'units': np.asarray([inputs['units']] if units is None else units, dtype=float),
+    }
+    # كل محور على بعد مستقل حتى يتوزع الحساب على الشبكة كاملة
+    shaped = {name: values.reshape([-1 if i == k else 1 for k in range(len(GRID_AXES))])
+              for i, (name, values) in enumerate(axes.items())}
+    result = cost_model(**{**inputs, **shaped})
+    cost_sqm = np.broadcast_to(result['cost_sqm'], tuple(len(v) for v in axes.values()))
+
+    margins = {label: margin_pct(price, cost_sqm) for label, price in (market_prices or {}).items()}
+    return {'axes': axes, 'cost_sqm': cost_sqm, 'margins': margins}
+
+
+def grid_range(center, spread_pct, steps):
+    """قيم متساوية حول قيمة الأساس (± نسبة مئوية)"""
+    return np.linspace(center * (1 - spread_pct / 100), center * (1 + spread_pct / 100), steps)
+
+
+# ==========================================
+# 3. محاكاة مونت كارلو لهامش الربح
+# ==========================================
+SIM_PERCENTILES = [5, 10, 25, 50, 75, 90, 95]
+
+
+def simulate_margins(price_samples, inputs, draws=100_000, land_sd_pct=0.0, build_sd_pct=0.0, seed=None):
+    """توزيع الهامش: سعر البيع يسحب من أسعار السوق الفعلية، وتكاليف الأرض والبناء تتذبذب اختيارياً
+
+    price_samples: أسعار المتر النظيفة للحي والنوع (من البيانات)
+    land_sd_pct / build_sd_pct: الانحراف المعياري (%) لسعر الأرض وسعر التنفيذ
+    """
+    price_samples = np.asarray(price_samples, dtype=float)
+    if price_samples.size == 0: return None
+    rng = np.random.default_rng(seed)
+
+    sale_price = price_samples[rng.integers(0, price_samples.size, draws)]
+    varied = dict(inputs)
+    if land_sd_pct > 0:
+        varied['land_price'] = inputs['land_price'] * np.clip(rng.normal(1.0, land_sd_pct / 100, draws), 0.0, None)
+    if build_sd_pct > 0:
+        varied['turnkey_price'] = inputs['turnkey_price'] * np.clip(rng.normal(1.0, build_sd_pct / 100, draws), 0.0, None)
+    cost_sqm = np.broadcast_to(cost_model(**varied)['cost_sqm'], (draws,))
+
+    margins = margin_pct(sale_price, cost_sqm)
+    return {
+        'margins': margins,
+        'cost_sqm': cost_sqm,
+        'percentiles': {p: float(v) for p, v in zip(SIM_PERCENTILES, np.percentile(margins, SIM_PERCENTILES))},
+        'mean': float(margins.mean()),
+        'samples': int(price_samples.size),
+    }
+
+
+def prob_margin_above(margins, target_pct):
+    """احتمال أن يتجاوز الهامش النسبة المستهدفة"""
+    return float(np.mean(np.asarray(margins) > target_pct)) if len(margins) else 0.0
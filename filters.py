@@ -0,0 +1,54 @@
+import streamlit as st
+
+ALL_LABEL = "الكل"
+
+
+def _band(label, key, index, name, step):
+    """نطاق رقمي (من - إلى)؛ الصفر يعني بدون حد، وstep خطوة أزرار +/- حسب مقياس العمود"""
+    low_default, high_default = index.value_range(name)
+    c1, c2 = st.columns(2)
+    with c1: low = st.number_input(f"{label} من", min_value=0, value=0, step=step, key=f"{key}_low",
+                                   help=f"أقل قيمة في البيانات: {low_default:,.0f}")
+    with c2: high = st.number_input(f"{label} إلى", min_value=0, value=0, step=step, key=f"{key}_high",
+                                    help=f"أعلى قيمة في البيانات: {high_default:,.0f}")
+    return (low or None, high or None)
+
+
+def sidebar_filters(index, key="filters"):
+    """فلاتر الشريط الجانبي (الحي، نوع العقار، نطاق السعر والمساحة) كوسائط لـ FilterIndex.positions"""
+    selected_dist = st.selectbox("تصفية حسب الحي:", [ALL_LABEL] + index.distinct('district'), key=f"{key}_district")
+    filters = {'district': None if selected_dist == ALL_LABEL else selected_dist}
+
+    with st.expander("فلاتر إضافية"):
+        types = st.multiselect("نوع العقار:", index.distinct('property_type'), key=f"{key}_types")
+        filters['property_type'] = types or None
+        filters['price'] = _band("السعر", f"{key}_price", index, 'price', step=1000)
+        filters['area'] = _band("المساحة", f"{key}_area", index, 'area', step=10)
+    return selected_dist, filters
+
+
+SORT_OPTIONS = {"سعر المتر": 'price_sqm', "السعر": 'price', "المساحة": 'area'}
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+def paginated_table(bot, filters, key, columns, rename=None, column_config=None):
+    """جدول مقسم لصفحات: الترتيب من الفهرس المخزن، وفقط صفوف الصفحة الحالية ترسل للمتصفح"""
+    total = bot.count(**filters)
+    if total == 0: return 0
+
+    c1, c2, c3, c4 = st.columns([2, 1, 1, 1])
+    with c1: sort_label = st.selectbox("ترتيب حسب:", list(SORT_OPTIONS), key=f"{key}_sort")
+    with c2: descending = st.toggle("تنازلي", False, key=f"{key}_desc")
+    with c3: page_size = st.selectbox("عدد الصفوف:", PAGE_SIZES, index=1, key=f"{key}_size")
+    pages = max(1, -(-total // page_size))
+    # عند تغير الفلاتر قد تصبح الصفحة المحفوظة خارج النطاق
+    if st.session_state.get(f"{key}_page", 1) > pages: st.session_state[f"{key}_page"] = pages
+    with c4: page = st.number_input(f"الصفحة (من {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+
+    page_df, total = bot.page(by=SORT_OPTIONS[sort_label], descending=descending, page=page, page_size=page_size, **filters)
+    view = page_df[[c for c in columns if c in page_df.columns]]
+    if rename: view = view.rename(columns=rename)
+    st.dataframe(view, use_container_width=True, column_config=column_config)
+    start = (page - 1) * page_size
+    st.caption(f"عرض {start + 1:,}–{min(start + page_size, total):,} من {total:,}")
+    return total
@@ -0,0 +1,81 @@
+"""تطابق classify_property_types مع دالة التصنيف الأصلية (صفاً صفاً) على بيانات صناعية"""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_bot
+
+
+def final_classify(raw_value, area, data_cat):
+    """نسخة من final_classify قبل التحويل إلى التصنيف على الأعمدة"""
+    raw = str(raw_value).strip().lower()
+    if 'صفقات' in data_cat or 'Sold' in data_cat:
+        if any(w in raw for w in ['أرض', 'land', 'راس', 'قطعة']): return "أرض"
+        return "مبني"
+    if any(w in raw for w in ['أرض', 'land', 'راس', 'قطعة']): return "أرض"
+    if any(w in raw for w in ['فيلا', 'فله', 'فلل', 'villa', 'تاون', 'town', 'بنتهاوس', 'penthouse', 'دبلكس']): return "فيلا"
+    if any(w in raw for w in ['شقة', 'شقه', 'شقق', 'apartment', 'flat', 'تمليك', 'استوديو']): return "شقة"
+    if any(w in raw for w in ['دور', 'طابق', 'floor', 'ادوار', 'أدوار']): return "دور"
+    if area < 200: return "شقة"
+    if 200 <= area < 360: return "دور"
+    return "فيلا"
+
+
+RAW_VALUES = [
+    'أرض', 'أرض سكنية', '  أرض  ', 'LAND', 'Land Plot', 'راس', 'قطعة رقم 5',
+    'فيلا', 'فيلا دوبلكس', 'فله', 'فلل', 'VILLA', ' Villa ', 'تاون هاوس', 'Town House', 'بنتهاوس', 'PentHouse', 'دبلكس',
+    'شقة', 'شقه', 'شقق', 'Apartment', 'FLAT', 'تمليك', 'استوديو',
+    'دور', 'دور علوي', 'طابق', 'Floor', 'ادوار', 'أدوار',
+    'سكني', 'تجاري', 'عمارة', '', '   ', np.nan, None, 0, 150, 3.5, 'nan',
+]
+AREAS = [0.0, 50.0, 199.99, 200.0, 250.0, 359.99, 360.0, 1000.0, np.nan]
+CATEGORIES = [data_bot.SOLD_CATEGORY, data_bot.ASK_CATEGORY]
+
+
+def _corpus():
+    rows = list(itertools.product(RAW_VALUES, AREAS))
+    return pd.Series([r for r, _ in rows], dtype=object), pd.Series([a for _, a in rows], dtype=float)
+
+
+@pytest.mark.parametrize('data_cat', CATEGORIES)
+def test_matches_row_function(data_cat):
+    raw, area = _corpus()
+    expected = [final_classify(r, a, data_cat) for r, a in zip(raw, area)]
+    result = data_bot.classify_property_types(raw, area, data_cat)
+    assert list(result.index) == list(raw.index)
+    assert result.tolist() == expected
+
+
+@pytest.mark.parametrize('data_cat', CATEGORIES)
+def test_random_corpus(data_cat):
+    rng = np.random.default_rng(0)
+    raw = pd.Series(rng.choice(np.array(RAW_VALUES, dtype=object), 5000), dtype=object)
+    area = pd.Series(rng.choice([*AREAS, *rng.uniform(0, 1500, 50)], 5000), dtype=float)
+    expected = [final_classify(r, a, data_cat) for r, a in zip(raw, area)]
+    assert data_bot.classify_property_types(raw, area, data_cat).tolist() == expected
+
+
+# فروق مقصودة: توحيد الكتابة (الهمزات، التاء المربوطة، التشكيل) يطابق صيغاً كانت تفوت الدالة الأصلية
+NORMALIZATION_CASES = [
+    ('ارض', data_bot.SOLD_CATEGORY, 'مبني', 'أرض'),
+    ('إرض زراعية', data_bot.ASK_CATEGORY, 'فيلا', 'أرض'),
+    ('فلة', data_bot.ASK_CATEGORY, 'دور', 'فيلا'),
+    ('فِيلَّا', data_bot.ASK_CATEGORY, 'دور', 'فيلا'),
+    ('شـقـة', data_bot.ASK_CATEGORY, 'دور', 'شقة'),
+    # أرضي/أرضية = الدور الأرضي: الدالة الأصلية كانت تعدها أرضاً إذا كتبت بالهمزة
+    ('دور أرضي', data_bot.ASK_CATEGORY, 'أرض', 'دور'),
+    ('شقة أرضية', data_bot.SOLD_CATEGORY, 'أرض', 'مبني'),
+    ('دور ارضي', data_bot.ASK_CATEGORY, 'دور', 'دور'),
+    ('شقة ارضية', data_bot.ASK_CATEGORY, 'شقة', 'شقة'),
+    ('شقة ارضية', data_bot.SOLD_CATEGORY, 'مبني', 'مبني'),
+    ('ارض سكنية', data_bot.ASK_CATEGORY, 'فيلا', 'أرض'),
+]
+
+
+@pytest.mark.parametrize('raw, data_cat, before, after', NORMALIZATION_CASES)
+def test_normalization_differences(raw, data_cat, before, after):
+    area = 1000.0 if before == 'فيلا' else 250.0
+    assert final_classify(raw, area, data_cat) == before
+    assert data_bot.classify_property_types(pd.Series([raw]), pd.Series([area]), data_cat).tolist() == [after]
@@ -0,0 +1,18 @@
+"""جدول الأحياء المجاورة للمقارنات"""
+import json
+
+import data_bot
+
+
+def test_neighbor_file_overrides_table(tmp_path):
+    path = tmp_path / 'neighbors.json'
+    path.write_text(json.dumps({'الملقا': ['حطين']}, ensure_ascii=False), encoding='utf-8')
+    assert data_bot.load_neighbor_districts(str(path)) == {'الملقا': ['حطين']}
+
+
+def test_bad_neighbor_file_keeps_default(tmp_path):
+    broken = tmp_path / 'broken.json'
+    broken.write_text('{not json', encoding='utf-8')
+    assert data_bot.load_neighbor_districts(str(broken)) is data_bot.NEIGHBOR_DISTRICTS
+    assert data_bot.load_neighbor_districts(str(tmp_path / 'missing.json')) is data_bot.NEIGHBOR_DISTRICTS
+    assert data_bot.load_neighbor_districts(str(broken), default={}) == {}
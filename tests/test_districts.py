@@ -0,0 +1,27 @@
+"""تحديد الحي من النص واسم الملف"""
+import pandas as pd
+import pytest
+
+import data_bot
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('صفقات_بدر.csv', 'بدر'),
+    ('مشروع_لبن', 'لبن'),
+    ('عروض-هيت-1.csv', 'هيت'),
+    ('صفقات_أحد_2024.csv', 'أحد'),
+    ('احد2', 'أحد'),
+    ('حي الملقا', 'الملقا'),
+    ('حي المَلْقا', 'الملقا'),
+    # الأسماء القصيرة لا تطابق داخل كلمة عربية أخرى
+    ('واحد', None),
+    ('بدرية', None),
+])
+def test_find_known_district(text, expected):
+    assert data_bot.find_known_district(text) == expected
+
+
+def test_filename_fallback_keeps_canonical_name():
+    resolved = data_bot.resolve_districts(pd.Series(['جميع الأحياء', 'nan']), pd.Series(['', '']),
+                                          'صفقات_أحد_2024.csv', data_bot.SOLD_CATEGORY)
+    assert resolved.tolist() == ['أحد', 'أحد']
@@ -0,0 +1,90 @@
+"""مهلة كل ملف والمهلة الكلية عند التحميل من درايف (درايف وهمي داخل العملية)"""
+import random
+import time
+
+import pytest
+
+import benchmark_ingestion
+import data_bot
+
+
+class SlowDrive(benchmark_ingestion.FakeDriveService):
+    """ملفات محددة تتأخر بالثواني المحددة قبل أن تعيد محتواها"""
+
+    def __init__(self, folder, delays):
+        super().__init__(folder)
+        self.delays = delays
+
+    def get_media(self, fileId):
+        def fetch():
+            time.sleep(self.delays.get(fileId, 0))
+            return self.files_by_id[fileId]['content']
+        return benchmark_ingestion._Request(fetch)
+
+
+def test_slow_file_fails_after_file_timeout(monkeypatch):
+    monkeypatch.setattr(data_bot, 'FILE_TIMEOUT_SECONDS', 0.3)
+    service = SlowDrive(benchmark_ingestion.generate_folder(3000, files=3, seed=4), {'fake-1': 1.5})
+    started = time.perf_counter()
+    bot = data_bot.RealEstateBot(max_workers=3, cache_dir='', service=service, load_deadline=0)
+    assert time.perf_counter() - started < 1.2
+    report = {r['file_id']: r for r in bot.ingestion_report}
+    assert report['fake-1']['status'] == 'failed' and 'timeout' in report['fake-1']['error']
+    assert report['fake-0']['status'] == report['fake-2']['status'] == 'downloaded'
+    assert bot.refresh_stats['failed'] == 1 and not bot.pending
+
+
+def test_load_deadline_leaves_slow_file_pending(monkeypatch):
+    monkeypatch.setattr(data_bot, 'FILE_TIMEOUT_SECONDS', 30)
+    service = SlowDrive(benchmark_ingestion.generate_folder(3000, files=3, seed=4), {'fake-2': 1.0})
+    bot = data_bot.RealEstateBot(cache_dir='', service=service, load_deadline=0.3)
+    assert bot.pending == {'fake-2': service.files_by_id['fake-2']['name']}
+    for _ in range(50):
+        if not bot.pending: break
+        time.sleep(0.1)
+    bot.refresh()
+    assert not bot.pending and bot.refresh_stats['cached'] == 3
+
+
+@pytest.fixture(scope='module')
+def big_folder():
+    """ملفان صغيران وملف كبير سريع التحميل لكن تحليله يتجاوز المهلة الكلية"""
+    folder = benchmark_ingestion.generate_folder(2000, files=2, seed=6)
+    rng = random.Random(6)
+    return folder + [('عروض كبير.csv', benchmark_ingestion.generate_csv(rng, 200_000, 'offers', 'utf-8-sig', ','))]
+
+
+@pytest.mark.parametrize('parse_workers', [0, 1])
+def test_load_deadline_covers_parsing(big_folder, parse_workers):
+    service = benchmark_ingestion.FakeDriveService(big_folder)
+    started = time.perf_counter()
+    bot = data_bot.RealEstateBot(cache_dir='', service=service, parse_workers=parse_workers, load_deadline=0.5)
+    try:
+        assert time.perf_counter() - started < 1.5
+        # مع عمليات التحليل قد تتأخر الملفات الصغيرة أيضاً (زمن تشغيل العمليات)
+        loaded = set() if bot.df.empty else set(bot.df['Source_File'].astype(str))
+        assert 'fake-2' in bot.pending and 'عروض كبير.csv' not in loaded
+        for _ in range(300):
+            if not bot.pending: break
+            time.sleep(0.1)
+        bot.refresh()
+        assert not bot.pending and bot.refresh_stats['cached'] == 3
+        assert (bot.df['Source_File'].astype(str) == 'عروض كبير.csv').sum() > 100_000
+    finally:
+        if bot._parse_pool is not None: bot._parse_pool.shutdown()
+
+
+def test_pool_results_yield_before_slow_downloads_finish():
+    service = SlowDrive(benchmark_ingestion.generate_folder(2000, files=3, seed=7), {'fake-2': 2.0})
+    bot = data_bot.RealEstateBot(max_workers=3, cache_dir='', service=service, parse_workers=1, autoload=False)
+    try:
+        started = time.perf_counter()
+        sources = bot.iter_sources()
+        report, frame = next(sources)
+        # الملف الأول يعرض فور تحليله في العملية، قبل انتهاء تحميل الملف البطيء
+        assert time.perf_counter() - started < 1.8
+        assert report['file_id'] != 'fake-2' and len(frame)
+        assert {r['file_id'] for r, _ in sources} | {report['file_id']} == {'fake-0', 'fake-1', 'fake-2'}
+        assert len(bot.df) == sum(r['rows_out'] for r in bot.ingestion_report)
+    finally:
+        if bot._parse_pool is not None: bot._parse_pool.shutdown()
@@ -0,0 +1,22 @@
+"""التحديث التزايدي: ما يعاد تحميله وما يقرأ من الكاش"""
+import benchmark_ingestion
+import data_bot
+
+
+def test_rename_reparses_name_dependent_columns(tmp_path):
+    folder = benchmark_ingestion.generate_folder(3000, files=2, seed=5)
+    service = benchmark_ingestion.FakeDriveService(folder)
+    bot = data_bot.RealEstateBot(cache_dir=str(tmp_path), service=service, load_deadline=0)
+    offers = next(entry for entry in service.files_by_id.values() if entry['name'].startswith('عروض'))
+    assert set(bot.df.loc[bot.df['Source_File'] == offers['name'], 'Data_Category'].astype(str)) == {data_bot.ASK_CATEGORY}
+
+    renamed = offers['name'].replace('عروض', 'صفقات')
+    offers['name'] = renamed
+    bot.refresh()
+    assert bot.refresh_stats['downloaded'] == 1 and bot.refresh_stats['cached'] == 1
+    rows = bot.df[bot.df['Source_File'] == renamed]
+    assert len(rows) and set(rows['Data_Category'].astype(str)) == {data_bot.SOLD_CATEGORY}
+
+    # نفس الاسم والمحتوى بعد إعادة التشغيل: من كاش القرص
+    fresh = data_bot.RealEstateBot(cache_dir=str(tmp_path), service=service, load_deadline=0)
+    assert fresh.refresh_stats['cached'] == 2 and fresh.refresh_stats['downloaded'] == 0
@@ -0,0 +1,85 @@
+"""دقة سكتشات المئينات مقابل المكعب الدقيق، وتطابق التحديث التزايدي مع إعادة البناء الكاملة"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+import benchmark_ingestion
+import data_bot
+
+TOLERANCE = data_bot.SKETCH_ACCURACY * (1 + 1e-9)
+
+
+def _synthetic_frame(rows=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    price_sqm = np.exp(rng.normal(8.3, 0.7, rows))
+    # قيم شاذة وناقصة تدخل في rows فقط
+    price_sqm[rng.choice(rows, rows // 50, replace=False)] = rng.choice([0.0, 10.0, 1e6, np.nan], rows // 50)
+    return pd.DataFrame({
+        'الحي': rng.choice(data_bot.KNOWN_DISTRICTS[:12], rows),
+        'Data_Category': rng.choice([data_bot.SOLD_CATEGORY, data_bot.ASK_CATEGORY], rows),
+        'نوع_العقار': rng.choice(['أرض', 'شقة', 'دور', 'فيلا', data_bot.SOLD_BUILT], rows),
+        'سعر_المتر': price_sqm,
+    })
+
+
+def _sketch_stats(df):
+    return {key: sketch.stat() for key, sketch in data_bot.build_stat_sketches(df).items()}
+
+
+def test_sketch_quantiles_within_accuracy():
+    df = _synthetic_frame()
+    exact = data_bot.build_market_stats(df)
+    approx = _sketch_stats(df)
+    assert approx.keys() == exact.keys()
+    for key, stat in exact.items():
+        assert approx[key]['rows'] == stat['rows'] and approx[key]['count'] == stat['count'], key
+        for name in ['median', *data_bot.STAT_QUANTILES]:
+            if stat['count']: assert abs(approx[key][name] - stat[name]) <= TOLERANCE * stat[name], (key, name)
+
+
+def test_merged_sketches_match_single_pass():
+    df = _synthetic_frame(seed=1)
+    merged = {}
+    for part in np.array_split(np.arange(len(df)), 7): data_bot.merge_sketches(merged, data_bot.build_stat_sketches(df.iloc[part]))
+    whole = data_bot.build_stat_sketches(df)
+    assert {k: s.to_list() for k, s in merged.items()} == {k: s.to_list() for k, s in whole.items()}
+
+    districts = data_bot.KNOWN_DISTRICTS[:3]
+    subset = df[df['الحي'].isin(districts) & (df['Data_Category'] == data_bot.ASK_CATEGORY) & (df['نوع_العقار'] != 'أرض')]
+    exact = data_bot.clean_price_values(subset['سعر_المتر']).median()
+    combined = data_bot.combined_stat(whole, districts, data_bot.ASK_CATEGORY, data_bot.ALL_BUILT)
+    assert abs(combined['median'] - exact) <= TOLERANCE * exact
+
+
+def _bot_for(service):
+    return data_bot.RealEstateBot(cache_dir='', service=service, load_deadline=0)
+
+
+def _replace(service, file_id, content):
+    entry = service.files_by_id[file_id]
+    entry['content'], entry['md5Checksum'] = content, hashlib.md5(content).hexdigest()
+
+
+def test_incremental_refresh_matches_full_rebuild():
+    service = benchmark_ingestion.FakeDriveService(benchmark_ingestion.generate_folder(6000, files=4, seed=3))
+    bot = _bot_for(service)
+
+    _replace(service, 'fake-1', benchmark_ingestion.generate_folder(1500, files=1, seed=9)[0][1])
+    del service.files_by_id['fake-3']
+    bot.refresh()
+    assert bot.refresh_stats['downloaded'] == 1 and bot.refresh_stats['evicted'] == 1
+
+    fresh = _bot_for(benchmark_ingestion.FakeDriveService(
+        [(entry['name'], entry['content']) for entry in service.files_by_id.values()]))
+    assert {k: s.to_list() for k, s in bot.stat_sketches.items()} == {k: s.to_list() for k, s in fresh.stat_sketches.items()}
+    assert bot.market_stats == fresh.market_stats
+
+
+def test_subtract_restores_sketch():
+    df = _synthetic_frame(rows=3000, seed=2)
+    base, extra = data_bot.build_stat_sketches(df.iloc[:2000]), data_bot.build_stat_sketches(df.iloc[2000:])
+    total = dict(base)
+    data_bot.merge_sketches(total, extra)
+    data_bot.merge_sketches(total, extra, sign=-1)
+    assert {k: s.to_list() for k, s in total.items()} == {k: s.to_list() for k, s in base.items()}
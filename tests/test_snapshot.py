@@ -0,0 +1,13 @@
+"""لقطة واحدة مربوطة بالذاكرة في عدة عمليات والانتقال لنسخة جديدة"""
+import os
+
+import pytest
+
+import benchmark_ingestion
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/smaps_rollup'), reason="PSS من /proc (لينكس فقط)")
+def test_reader_processes_attach_and_switch():
+    record = benchmark_ingestion.run_snapshot_readers(3000, files=2, readers=2, seed=3)
+    assert record['attached_versions_ok'] and record['switched']
+    assert len(record['attach_pss_growth_mb']) == 2 and record['rows_out'] > 0